@@ -2,4 +2,4 @@
 Pacote agent - Agente de IA Zeus
 """
 
-from .orchestrator import AgentOrchestrator
+from .orchestrator import AgentOrchestrator, get_orchestrator
@@ -7,13 +7,229 @@ Gerencia containers Docker efêmeros por sessão
 
 import docker
 import asyncio
-from typing import Optional
+import contextlib
+import functools
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from docker.utils.socket import frames_iter, STDERR
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from typing import ClassVar, Optional
 from config import get_settings, get_logger
 from agent.tools.docker_helper import get_docker_client
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+# -------------------------------------------------
+# Runner Python persistente
+# -------------------------------------------------
+# Processo python3 mantido vivo dentro do container da sessão. Recebe pelo
+# stdin frames no formato {"len": N}\n<N bytes de código>, executa cada código
+# em um namespace novo e sinaliza o fim com um sentinela (com nonce) em
+# stdout e stderr. Evita o custo de subir um interpretador a cada execução.
+#
+# O pipe do protocolo é movido para outro descritor e o fd 0 passa a ser
+# /dev/null, para que input() ou subprocessos do código do usuário não
+# bloqueiem nem consumam o próximo frame. Entre execuções são restaurados
+# sys.modules (módulos novos são descartados), sys.path, os.environ e o
+# diretório atual; threads iniciadas pelo código e alterações em módulos que
+# já estavam carregados não são desfeitas.
+_RUNNER_SOURCE = r'''
+import json, os, sys, traceback
+nonce = sys.argv[1]
+real_out, real_err = sys.stdout, sys.stderr
+stdin = os.fdopen(os.dup(0), "rb")
+devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(devnull, 0)
+os.close(devnull)
+base_modules = set(sys.modules)
+base_path = list(sys.path)
+base_env = dict(os.environ)
+real_out.write("<<<ZEUS_READY_%s:%d>>>\n" % (nonce, os.getpid()))
+real_out.flush()
+while True:
+    header = stdin.readline()
+    if not header:
+        break
+    code = stdin.read(json.loads(header)["len"]).decode("utf-8")
+    rc = 0
+    sys.stdin = open(os.devnull)
+    try:
+        exec(compile(code, "<zeus>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            rc = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            rc = 1
+    except BaseException:
+        etype, value, tb = sys.exc_info()
+        traceback.print_exception(etype, value, tb.tb_next)
+        rc = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    sys.stdout, sys.stderr = real_out, real_err
+    try:
+        sys.stdin.close()
+    except Exception:
+        pass
+    sys.stdin = sys.__stdin__
+    for name in set(sys.modules) - base_modules:
+        del sys.modules[name]
+    sys.path[:] = base_path
+    if os.environ != base_env:
+        os.environ.clear()
+        os.environ.update(base_env)
+    try:
+        os.chdir("/app/data")
+    except OSError:
+        pass
+    real_err.write("\n<<<ZEUS_END_%s>>>\n" % nonce)
+    real_err.flush()
+    real_out.write("\n<<<ZEUS_END_%s:%d>>>\n" % (nonce, rc))
+    real_out.flush()
+'''
+
+
+# -------------------------------------------------
+# Retry para falhas transitórias do daemon Docker
+# -------------------------------------------------
+def _is_transient_docker_error(e: Exception) -> bool:
+    """Erros de conexão ou 5xx do daemon; 4xx (NotFound, Conflict...) não mudam com retry."""
+    if isinstance(e, RequestsConnectionError):
+        return True
+    return isinstance(e, docker.errors.APIError) and e.is_server_error()
+
+
+def _retry_docker(tries: int = 3, base_delay: float = 0.05):
+    """
+    Repete chamadas síncronas ao SDK do Docker em falhas transitórias.
+    
+    Backoff exponencial com jitter (~50ms, ~200ms entre as tentativas).
+    Só deve envolver operações seguras de repetir (nada depois que um
+    processo já foi iniciado no container).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(tries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == tries - 1 or not _is_transient_docker_error(e):
+                        raise
+                    delay = base_delay * (4 ** attempt) * random.uniform(0.5, 1.5)
+                    logger.warning(
+                        "Falha transitória no Docker, repetindo",
+                        operation=func.__name__,
+                        attempt=attempt + 1,
+                        delay=round(delay, 3),
+                        error=str(e)
+                    )
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
+# Comandos com estes caracteres (pipes, redirecionamentos, aspas, variáveis,
+# globs, atribuições...) ou iniciados por builtins do shell precisam do bash.
+# Os demais são executados direto como argv, sem um processo bash a mais;
+# se o Docker não encontrar o executável (builtin fora da lista), o comando
+# é repetido via bash.
+_SHELL_SYNTAX = re.compile(r"[|&;<>()$`\\\"'*?\[\]{}~#=%!\n]")
+_SHELL_BUILTINS = frozenset({
+    "cd", "export", "source", ".", ":", "alias", "unalias", "set", "unset", "ulimit",
+    "umask", "exit", "exec", "eval", "trap", "wait", "jobs", "fg", "bg", "read",
+    "shopt", "history", "type", "hash", "pushd", "popd", "dirs", "command",
+    "builtin", "enable", "help", "declare", "typeset", "local", "readonly",
+    "shift", "getopts", "mapfile", "readarray", "let", "disown", "suspend",
+    "logout", "caller", "compgen", "complete", "compopt", "coproc", "select",
+    "if", "for", "while", "until", "case", "function", "time", "[[",
+})
+# Falha do runtime ao iniciar o processo do exec (o comando nem chegou a rodar)
+_EXEC_NOT_FOUND = re.compile(r"executable file not found|exec failed")
+
+
+class _RunnerUnavailable(Exception):
+    """O código não chegou ao runner (falha ao iniciar ou ao enviar o frame)."""
+
+
+class _PythonRunner:
+    """Conexão com o runner Python persistente de uma sessão."""
+    
+    def __init__(self, exec_id: str, sock, nonce: str):
+        self.exec_id = exec_id
+        self.sock = sock
+        # O objeto retornado pelo exec_start pode ser um SocketIO; o socket real fica em _sock
+        self.raw_sock = getattr(sock, "_sock", sock)
+        self.frames = frames_iter(sock, tty=False)
+        self.nonce = nonce
+        self.pid: Optional[int] = None
+        self.timed_out = False
+        # Uma execução por vez no mesmo runner
+        self.lock = threading.Lock()
+        
+        self.ready_re = re.compile(rb"<<<ZEUS_READY_" + nonce.encode() + rb":(\d+)>>>\n")
+        self.stdout_end = re.compile(rb"\n<<<ZEUS_END_" + nonce.encode() + rb":(-?\d+)>>>\n$")
+        self.stderr_end = b"\n<<<ZEUS_END_" + nonce.encode() + b">>>\n"
+    
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+class _SessionLocks:
+    """
+    Locks asyncio por sessão, limitados a max_size entradas.
+    
+    A entrada de uma sessão é mantida enquanto alguém segura ou espera o
+    lock; ao passar do limite, só entradas ociosas (as mais antigas primeiro)
+    são descartadas, então duas chamadas da mesma sessão nunca acabam com
+    locks diferentes.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # session_id -> [lock, chamadas segurando ou esperando]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @contextlib.asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = self._entries[session_id] = [asyncio.Lock(), 0]
+        else:
+            self._entries.move_to_end(session_id)
+        
+        entry[1] += 1
+        self._evict_idle()
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            self._evict_idle()
+    
+    def _evict_idle(self):
+        excess = len(self._entries) - self.max_size
+        if excess <= 0:
+            return
+        idle = [key for key, (_, users) in self._entries.items() if users == 0]
+        for key in idle[:excess]:
+            del self._entries[key]
+
+
 class ContainerSessionManager:
     """
     Gerencia o ciclo de vida de containers isolados por sessão.
@@ -22,18 +238,153 @@ class ContainerSessionManager:
     
     IMAGE_NAME = "zeus-sandbox:v1" # Imagem customizada com dependências
 
+    # Cliente Docker compartilhado por todas as operações da classe.
+    # get_docker_client() faz um ping a cada chamada; aqui o cliente é
+    # resolvido uma única vez e reaproveitado.
+    _client: ClassVar[Optional[docker.DockerClient]] = None
+
+    # Runners Python persistentes por sessão
+    _runners: ClassVar[dict[str, _PythonRunner]] = {}
+
+    # Container resolvido por sessão e lock que serializa get-or-create
+    _containers: ClassVar[dict[str, docker.models.containers.Container]] = {}
+    _locks: ClassVar[_SessionLocks] = _SessionLocks(max_size=1024)
+
+    # Nome do container por sessão (evita recalcular a data a cada chamada)
+    _session_names: ClassVar[dict[str, str]] = {}
+
+    # Pool de containers ociosos já iniciados, renomeados para a sessão no
+    # primeiro uso. Todos montam o mesmo volume de dados, então qualquer um
+    # serve para qualquer sessão.
+    PREWARM_PREFIX = "zeus-prewarm-"
+    _prewarm_pool: ClassVar[deque] = deque()
+    _prewarm_wanted: ClassVar[asyncio.Event] = asyncio.Event()
+    _prewarm_task: ClassVar[Optional[asyncio.Task]] = None
+
+    @classmethod
+    def _get_client(cls) -> Optional[docker.DockerClient]:
+        """Retorna o cliente Docker memoizado (conecta na primeira chamada)."""
+        if cls._client is None:
+            cls._client = get_docker_client()
+        return cls._client
+
+    @classmethod
+    async def aclose(cls):
+        """Fecha o cliente Docker compartilhado (chamado no shutdown da aplicação)."""
+        if cls._prewarm_task is not None:
+            cls._prewarm_task.cancel()
+            cls._prewarm_task = None
+            try:
+                await asyncio.to_thread(cls._drain_prewarm_pool_sync)
+            except Exception as e:
+                logger.warning("Erro ao limpar pool pré-aquecido", error=str(e))
+        
+        client = cls._client
+        cls._client = None
+        if client is not None:
+            try:
+                await asyncio.to_thread(client.close)
+            except Exception as e:
+                logger.warning("Erro ao fechar cliente Docker", error=str(e))
+
     @classmethod
     def get_container_name(cls, session_id: str) -> str:
-        from datetime import datetime
-        date_str = datetime.now().strftime("%d-%m-%Y")
-        return f"{date_str}-{session_id}"
+        """
+        Nome do container da sessão, calculado uma vez e memoizado.
+        A data fica fixa no primeiro acesso da sessão (inclusive após a meia-noite).
+        """
+        name = cls._session_names.get(session_id)
+        if name is None:
+            from datetime import datetime
+            date_str = datetime.now().strftime("%d-%m-%Y")
+            name = cls._session_names[session_id] = f"{date_str}-{session_id}"
+        return name
 
     @classmethod
-    def get_or_create_container(cls, session_id: str) -> Optional[docker.models.containers.Container]:
+    def ensure_image(cls):
+        """
+        Garante que a imagem do sandbox exista (build ou fallback).
+        Chamado uma vez no startup, fora do caminho de criação de containers.
+        """
+        client = cls._get_client()
+        if not client:
+            logger.error("Docker client não disponível")
+            return
+
+        try:
+            client.images.get(cls.IMAGE_NAME)
+        except docker.errors.ImageNotFound:
+            logger.info(f"Imagem {cls.IMAGE_NAME} não encontrada. Iniciando build...")
+            try:
+                # Build usando SDK
+                # Contexto é a raiz do projeto (onde o app roda, backend ou root?)
+                # Assumindo que Dockerfile.sandbox está em ./docker/Dockerfile.sandbox relativo ao working dir
+                import os
+                dockerfile_path = os.path.join("docker", "Dockerfile.sandbox")
+                        
+                # Se não achar o arquivo, tenta ajustar path (se rodando de dentro de backend/)
+                if not os.path.exists(dockerfile_path) and os.path.exists(os.path.join("..", "docker", "Dockerfile.sandbox")):
+                     dockerfile_path = os.path.join("..", "docker", "Dockerfile.sandbox")
+                     build_context = ".."
+                else:
+                     build_context = "."
+                             
+                logger.info(f"Construindo imagem a partir de {dockerfile_path} context context {build_context}")
+                        
+                image, build_logs = client.images.build(
+                    path=build_context,
+                    dockerfile=dockerfile_path,
+                    tag=cls.IMAGE_NAME,
+                    rm=True
+                )
+                for chunk in build_logs:
+                    if 'stream' in chunk:
+                        logger.debug(chunk['stream'].strip())
+                                
+                logger.info(f"Imagem {cls.IMAGE_NAME} construída com sucesso!")
+                        
+            except Exception as build_err:
+                logger.error(f"Erro ao buildar imagem: {build_err}")
+                logger.warning("Tentando usar python:3.11-slim como fallback...")
+                # Fallback se build falhar
+                cls.IMAGE_NAME = "python:3.11-slim"
+                client.images.pull("python", tag="3.11-slim")
+
+    @classmethod
+    async def get_or_create_container(cls, session_id: str) -> Optional[docker.models.containers.Container]:
         """
         Obtém um container existente para a sessão ou cria um novo.
+        
+        O lock por sessão evita que chamadas concorrentes criem o mesmo
+        container duas vezes, e o container resolvido fica em cache para
+        as próximas execuções não consultarem o Docker.
+        
+        As chamadas ao SDK do Docker são bloqueantes, então toda a sequência
+        get/start/build/run roda em uma única thread, sem travar o event loop.
         """
-        client = get_docker_client()
+        async with cls._locks.hold(session_id):
+            # O container é gerenciado só por esta classe: o cache é confiável
+            # e o status só é reconferido quando um exec falha
+            # (ver _exec_with_restart_sync)
+            container = cls._containers.get(session_id)
+            if container is not None:
+                return container
+            
+            container = await asyncio.to_thread(cls._get_or_create_container_sync, session_id)
+            if container is not None:
+                cls._containers[session_id] = container
+        
+        # Repor o pool se algum container pré-aquecido foi consumido
+        # (o Event só pode ser sinalizado a partir do event loop)
+        if len(cls._prewarm_pool) < settings.sandbox_prewarm_pool_size:
+            cls._prewarm_wanted.set()
+        return container
+
+    @classmethod
+    @_retry_docker()
+    def _get_or_create_container_sync(cls, session_id: str) -> Optional[docker.models.containers.Container]:
+        """Versão síncrona de get_or_create_container (roda em thread)."""
+        client = cls._get_client()
         if not client:
             logger.error("Docker client não disponível")
             return None
@@ -51,78 +402,9 @@ class ContainerSessionManager:
             # Criar novo
             logger.info("Criando novo container para sessão", session_id=session_id)
             try:
-                # IMPORTANTE: Usar HOST_DATA_DIR (caminho real no host da VPS)
-                # e não settings.data_dir (que é /app/data, interno ao container principal)
-                # Isso garante que arquivos baixados no sandbox persistam no host
-                import os
-                host_data_dir = os.environ.get('HOST_DATA_DIR', settings.data_dir)
-                
-                # Se for caminho relativo (./data), converter para absoluto baseado no diretório do compose
-                # Na VPS, isso seria algo como /root/zeus/data
-                if host_data_dir.startswith('./') or host_data_dir.startswith('.\\'):
-                    # Assumimos que o compose roda em /root/zeus ou similar
-                    # Precisamos do caminho absoluto do host
-                    compose_dir = os.environ.get('COMPOSE_PROJECT_DIR', '/root/zeus')
-                    host_data_dir = os.path.join(compose_dir, host_data_dir[2:])
-                    
-                logger.info("Montando volume de dados", host_path=host_data_dir, container_path='/app/data')
-                
-                # Montar volume de dados para persistência durante a sessão
-                volumes = {
-                    host_data_dir: {'bind': '/app/data', 'mode': 'rw'}
-                }
-                
-                # Verificar se a imagem existe, se não, construir
-                try:
-                    client.images.get(cls.IMAGE_NAME)
-                except docker.errors.ImageNotFound:
-                    logger.info(f"Imagem {cls.IMAGE_NAME} não encontrada. Iniciando build...")
-                    try:
-                        # Build usando SDK
-                        # Contexto é a raiz do projeto (onde o app roda, backend ou root?)
-                        # Assumindo que Dockerfile.sandbox está em ./docker/Dockerfile.sandbox relativo ao working dir
-                        import os
-                        dockerfile_path = os.path.join("docker", "Dockerfile.sandbox")
-                        
-                        # Se não achar o arquivo, tenta ajustar path (se rodando de dentro de backend/)
-                        if not os.path.exists(dockerfile_path) and os.path.exists(os.path.join("..", "docker", "Dockerfile.sandbox")):
-                             dockerfile_path = os.path.join("..", "docker", "Dockerfile.sandbox")
-                             build_context = ".."
-                        else:
-                             build_context = "."
-                             
-                        logger.info(f"Construindo imagem a partir de {dockerfile_path} context context {build_context}")
-                        
-                        image, build_logs = client.images.build(
-                            path=build_context,
-                            dockerfile=dockerfile_path,
-                            tag=cls.IMAGE_NAME,
-                            rm=True
-                        )
-                        for chunk in build_logs:
-                            if 'stream' in chunk:
-                                logger.debug(chunk['stream'].strip())
-                                
-                        logger.info(f"Imagem {cls.IMAGE_NAME} construída com sucesso!")
-                        
-                    except Exception as build_err:
-                        logger.error(f"Erro ao buildar imagem: {build_err}")
-                        logger.warning("Tentando usar python:3.11-slim como fallback...")
-                        # Fallback se build falhar
-                        cls.IMAGE_NAME = "python:3.11-slim"
-                
-                container = client.containers.run(
-                    image=cls.IMAGE_NAME,
-                    name=container_name,
-                    command="tail -f /dev/null", # Manter rodando
-                    detach=True,
-                    volumes=volumes,
-                    working_dir="/app/data",
-                    restart_policy={"Name": "no"}, # Não reiniciar automaticamente
-                    network_mode="bridge",
-                    # Importante: aumentar shm_size para multiprocessamento (whisper/pl)
-                    shm_size="512m" 
-                )
+                container = cls._take_prewarmed_sync(container_name)
+                if container is None:
+                    container = cls._run_container_sync(client, container_name)
                 logger.info("Container criado com sucesso", id=container.short_id)
                 return container
             except Exception as e:
@@ -133,15 +415,134 @@ class ContainerSessionManager:
             raise e
 
     @classmethod
-    def cleanup_container(cls, session_id: str):
+    def _run_container_sync(cls, client: docker.DockerClient, name: str) -> docker.models.containers.Container:
+        """Sobe um container do sandbox (ocioso, com o volume de dados montado)."""
+        # IMPORTANTE: Usar HOST_DATA_DIR (caminho real no host da VPS)
+        # e não settings.data_dir (que é /app/data, interno ao container principal)
+        # Isso garante que arquivos baixados no sandbox persistam no host
+        import os
+        host_data_dir = os.environ.get('HOST_DATA_DIR', settings.data_dir)
+            
+        # Se for caminho relativo (./data), converter para absoluto baseado no diretório do compose
+        # Na VPS, isso seria algo como /root/zeus/data
+        if host_data_dir.startswith('./') or host_data_dir.startswith('.\\'):
+            # Assumimos que o compose roda em /root/zeus ou similar
+            # Precisamos do caminho absoluto do host
+            compose_dir = os.environ.get('COMPOSE_PROJECT_DIR', '/root/zeus')
+            host_data_dir = os.path.join(compose_dir, host_data_dir[2:])
+                
+        logger.info("Montando volume de dados", host_path=host_data_dir, container_path='/app/data')
+            
+        # Montar volume de dados para persistência durante a sessão
+        volumes = {
+            host_data_dir: {'bind': '/app/data', 'mode': 'rw'}
+        }
+            
+        return client.containers.run(
+            image=cls.IMAGE_NAME,
+            name=name,
+            command="tail -f /dev/null", # Manter rodando
+            detach=True,
+            volumes=volumes,
+            working_dir="/app/data",
+            restart_policy={"Name": "no"}, # Não reiniciar automaticamente
+            network_mode="bridge",
+            # Importante: aumentar shm_size para multiprocessamento (whisper/pl)
+            shm_size="512m" 
+        )
+
+    @classmethod
+    def _take_prewarmed_sync(cls, container_name: str) -> Optional[docker.models.containers.Container]:
+        """
+        Retira um container do pool pré-aquecido e o renomeia para a sessão.
+        Retorna None se o pool estiver vazio.
+        """
+        while True:
+            try:
+                container = cls._prewarm_pool.popleft()
+            except IndexError:
+                return None
+            try:
+                container.rename(container_name)
+                logger.info("Container pré-aquecido atribuído à sessão", id=container.short_id, name=container_name)
+                return container
+            except Exception as e:
+                # Container do pool morreu ou foi removido; descartar e tentar o próximo
+                logger.warning("Container pré-aquecido inválido, descartando", id=container.short_id, error=str(e))
+                try:
+                    container.remove(force=True)
+                except Exception:
+                    pass
+
+    @classmethod
+    def _fill_prewarm_pool_sync(cls):
+        """Completa o pool de containers pré-aquecidos até o tamanho configurado."""
+        client = cls._get_client()
+        if not client:
+            return
+        
+        while len(cls._prewarm_pool) < settings.sandbox_prewarm_pool_size:
+            name = f"{cls.PREWARM_PREFIX}{uuid.uuid4().hex[:12]}"
+            container = cls._run_container_sync(client, name)
+            cls._prewarm_pool.append(container)
+            logger.info("Container pré-aquecido criado", id=container.short_id, pool_size=len(cls._prewarm_pool))
+
+    @classmethod
+    def _drain_prewarm_pool_sync(cls):
+        """Remove os containers pré-aquecidos (inclusive sobras de execuções anteriores)."""
+        cls._prewarm_pool.clear()
+        client = cls._get_client()
+        if not client:
+            return
+        for container in client.containers.list(all=True, filters={"name": cls.PREWARM_PREFIX}):
+            try:
+                container.remove(force=True)
+            except Exception as e:
+                logger.warning("Erro ao remover container pré-aquecido", id=container.short_id, error=str(e))
+
+    @classmethod
+    async def _prewarm_loop(cls):
+        """Mantém o pool de containers pré-aquecidos cheio."""
+        while True:
+            cls._prewarm_wanted.clear()
+            try:
+                await asyncio.to_thread(cls._fill_prewarm_pool_sync)
+            except Exception as e:
+                logger.error("Erro ao pré-aquecer containers", error=str(e))
+                await asyncio.sleep(30)
+                continue
+            await cls._prewarm_wanted.wait()
+
+    @classmethod
+    async def start_prewarm(cls):
+        """Inicia a manutenção do pool pré-aquecido (chamado no startup)."""
+        if settings.sandbox_prewarm_pool_size <= 0 or cls._prewarm_task is not None:
+            return
+        await asyncio.to_thread(cls._drain_prewarm_pool_sync)
+        cls._prewarm_task = asyncio.create_task(cls._prewarm_loop())
+
+    @classmethod
+    async def cleanup_container(cls, session_id: str):
         """
         Remove o container da sessão (kill & remove).
         """
-        client = get_docker_client()
+        async with cls._locks.hold(session_id):
+            cls._containers.pop(session_id, None)
+            await asyncio.to_thread(cls._cleanup_container_sync, session_id)
+
+    @classmethod
+    def _cleanup_container_sync(cls, session_id: str):
+        """Versão síncrona de cleanup_container (roda em thread)."""
+        client = cls._get_client()
         if not client:
             return
 
         container_name = cls.get_container_name(session_id)
+        cls._session_names.pop(session_id, None)
+        
+        runner = cls._runners.pop(session_id, None)
+        if runner:
+            runner.close()
         
         try:
             container = client.containers.get(container_name)
@@ -154,40 +555,328 @@ class ContainerSessionManager:
             logger.error("Erro ao limpar container de sessão", error=str(e))
 
     @classmethod
-    async def execute_command(cls, session_id: str, command: str, timeout: int = 30) -> tuple[int, str, str]:
+    async def execute_command(cls, session_id: str, command: str | list[str], timeout: int = 30) -> tuple[int, str, str]:
         """
         Executa comando no container da sessão.
+        
+        Listas são executadas diretamente (argv). Strings simples, sem nada
+        que dependa do shell, viram argv por split; as demais rodam via
+        ["bash", "-c", command]. Se o argv por split falhar porque o
+        executável não existe, o comando é repetido via bash.
+        
         Retorna (exit_code, stdout, stderr)
         """
-        container = cls.get_or_create_container(session_id)
+        container = await cls.get_or_create_container(session_id)
         if not container:
             raise Exception("Não foi possível obter container para execução")
         
+        argv = cls._command_argv(command)
+        # argv montado por split: se o executável não existir (provavelmente
+        # um builtin do shell fora da lista), o processo nem iniciou e o
+        # comando pode ser repetido via bash com segurança
+        split_argv = isinstance(command, str) and argv[0] != "bash"
         try:
-            import shlex
-            
-            def _run():
-                return container.exec_run(
-                    cmd=f"bash -c {shlex.quote(command)}", 
-                    demux=True,
-                    workdir="/app/data"
-                )
-            
             # Executar em thread para não bloquear loop
-            exec_result = await asyncio.to_thread(_run)
-            
-            exit_code = exec_result.exit_code
-            stdout_bytes, stderr_bytes = exec_result.output
+            try:
+                exit_code, stdout_str, stderr_str = await asyncio.to_thread(
+                    cls._exec_with_restart_sync,
+                    container,
+                    argv
+                )
+            except docker.errors.APIError as e:
+                if not (split_argv and _EXEC_NOT_FOUND.search(str(e))):
+                    raise
+                exit_code, stdout_str, stderr_str = 127, "", str(e)
             
-            stdout_str = stdout_bytes.decode('utf-8', errors='replace') if stdout_bytes else ""
-            stderr_str = stderr_bytes.decode('utf-8', errors='replace') if stderr_bytes else ""
+            if (
+                split_argv
+                and exit_code in (126, 127)
+                and _EXEC_NOT_FOUND.search(stdout_str + stderr_str)
+            ):
+                logger.debug("Executável não encontrado, repetindo via bash", command=argv[0])
+                exit_code, stdout_str, stderr_str = await asyncio.to_thread(
+                    cls._exec_with_restart_sync,
+                    container,
+                    ["bash", "-c", command]
+                )
             
             return exit_code, stdout_str, stderr_str
             
         except Exception as e:
             logger.error("Erro na execução do comando docker", error=str(e))
+            cls._forget_container_on_error(session_id, e)
             raise e
 
+    @classmethod
+    def _forget_container_on_error(cls, session_id: str, e: Exception):
+        """Após falha do Docker, tira o container do cache para a próxima chamada resolvê-lo de novo."""
+        if isinstance(e, (docker.errors.APIError, RequestsConnectionError)):
+            cls._containers.pop(session_id, None)
+
+    @staticmethod
+    def _command_argv(command: str | list[str]) -> list[str]:
+        """Converte o comando em argv, só passando pelo bash quando necessário."""
+        if isinstance(command, list):
+            return command
+        
+        argv = command.split()
+        if not argv or _SHELL_SYNTAX.search(command) or argv[0] in _SHELL_BUILTINS:
+            return ["bash", "-c", command]
+        return argv
+
+    @staticmethod
+    def _read_demuxed(sock) -> tuple[bytes, bytes]:
+        """
+        Lê a saída multiplexada de um exec (tty desabilitado) até o EOF.
+        
+        Cada frame do Docker traz um cabeçalho de 8 bytes com o stream
+        (1 = stdout, 2 = stderr) e o tamanho; o payload é anexado direto
+        ao buffer do stream correspondente, sem concatenações de str por frame.
+        """
+        stdout_buf = bytearray()
+        stderr_buf = bytearray()
+        
+        for stream, payload in frames_iter(sock, tty=False):
+            if stream == STDERR:
+                stderr_buf += payload
+            else:
+                stdout_buf += payload
+        
+        return bytes(stdout_buf), bytes(stderr_buf)
+
+    @classmethod
+    @_retry_docker()
+    def _open_exec_sync(cls, container, cmd, stdin: bool = False):
+        """
+        Cria o exec e conecta ao socket dele (o processo ainda não recebeu
+        nada, então é seguro repetir em falha transitória).
+        
+        Returns:
+            (exec_id, socket)
+        """
+        api = cls._get_client().api
+        
+        exec_id = api.exec_create(
+            container.id,
+            cmd,
+            stdin=stdin,
+            stdout=True,
+            stderr=True,
+            workdir="/app/data"
+        )["Id"]
+        
+        return exec_id, api.exec_start(exec_id, socket=True)
+
+    @classmethod
+    def _exec_sync(cls, container, cmd, stdin_data: Optional[bytes] = None) -> tuple[int, str, str]:
+        """
+        Executa um comando no container via socket do exec (roda em thread).
+        
+        Usa a API de baixo nível do Docker: cria o exec, e se stdin_data for
+        informado escreve os dados no socket e fecha o lado de escrita (EOF
+        para o processo). A saída é lida frame a frame separando stdout/stderr.
+        
+        Returns:
+            (exit_code, stdout, stderr)
+        """
+        api = cls._get_client().api
+        
+        exec_id, sock = cls._open_exec_sync(container, cmd, stdin=stdin_data is not None)
+        # O objeto retornado pode ser um SocketIO; o socket real fica em _sock
+        raw_sock = getattr(sock, "_sock", sock)
+        
+        try:
+            if stdin_data is not None:
+                raw_sock.sendall(stdin_data)
+                raw_sock.shutdown(socket.SHUT_WR)
+            
+            stdout_bytes, stderr_bytes = cls._read_demuxed(sock)
+        finally:
+            sock.close()
+        
+        exit_code = api.exec_inspect(exec_id)["ExitCode"]
+        
+        # Decodificação única ao final
+        stdout_str = stdout_bytes.decode('utf-8', errors='replace')
+        stderr_str = stderr_bytes.decode('utf-8', errors='replace')
+        
+        return exit_code, stdout_str, stderr_str
+
+    @classmethod
+    def _exec_with_restart_sync(cls, container, cmd, stdin_data: Optional[bytes] = None) -> tuple[int, str, str]:
+        """
+        _exec_sync com uma nova tentativa se o Docker recusar o exec
+        (container parado): recarrega o estado, reinicia e repete uma vez.
+        """
+        try:
+            return cls._exec_sync(container, cmd, stdin_data)
+        except docker.errors.APIError as e:
+            previous_status = container.status
+            container.reload()
+            if container.status == 'running':
+                raise
+            logger.warning(
+                "Container da sessão fora de execução, reiniciando",
+                name=container.name,
+                previous_status=previous_status,
+                status=container.status,
+                error=str(e)
+            )
+            container.start()
+            return cls._exec_sync(container, cmd, stdin_data)
+
+    @classmethod
+    def _start_runner_sync(cls, container) -> _PythonRunner:
+        """Inicia o runner Python persistente no container e aguarda o sinal de pronto."""
+        nonce = uuid.uuid4().hex
+        
+        exec_id, sock = cls._open_exec_sync(
+            container,
+            ["python3", "-u", "-c", _RUNNER_SOURCE, nonce],
+            stdin=True
+        )
+        runner = _PythonRunner(exec_id, sock, nonce)
+        
+        stdout_buf = bytearray()
+        for stream, payload in runner.frames:
+            if stream != STDERR:
+                stdout_buf += payload
+                match = runner.ready_re.search(stdout_buf)
+                if match:
+                    runner.pid = int(match.group(1))
+                    return runner
+        
+        runner.close()
+        raise RuntimeError("Runner Python encerrou antes de ficar pronto")
+
+    @classmethod
+    async def _get_or_start_runner(cls, container, session_id: str) -> _PythonRunner:
+        """
+        Retorna o runner da sessão, iniciando um se não houver.
+        
+        Roda sob o lock da sessão para que chamadas concorrentes não iniciem
+        dois runners (o segundo substituiria o primeiro no registro e o
+        processo python3 anterior ficaria órfão no container).
+        """
+        async with cls._locks.hold(session_id):
+            runner = cls._runners.get(session_id)
+            if runner is None:
+                try:
+                    runner = await asyncio.to_thread(cls._start_runner_sync, container)
+                except Exception as e:
+                    raise _RunnerUnavailable(str(e)) from e
+                cls._runners[session_id] = runner
+            return runner
+
+    @classmethod
+    async def _run_in_runner(cls, container, session_id: str, code: str, timeout: int) -> tuple[int, str, str]:
+        """
+        Executa código no runner persistente da sessão.
+        
+        Se o envio falhar (runner morto, container reiniciado), um novo runner
+        é iniciado e o envio é repetido uma vez. Levanta _RunnerUnavailable
+        só quando o código certamente não foi entregue; erros depois do envio
+        são propagados normalmente (o código pode ter executado).
+        
+        Returns:
+            (exit_code, stdout, stderr)
+        """
+        payload = code.encode('utf-8')
+        frame = json.dumps({"len": len(payload)}).encode() + b"\n" + payload
+        
+        for attempt in range(2):
+            runner = await cls._get_or_start_runner(container, session_id)
+            try:
+                return await asyncio.to_thread(
+                    cls._run_in_runner_sync, container, session_id, runner, frame, timeout
+                )
+            except _RunnerUnavailable:
+                if attempt == 1:
+                    raise
+
+    @classmethod
+    def _run_in_runner_sync(cls, container, session_id: str, runner: _PythonRunner, frame: bytes, timeout: int) -> tuple[int, str, str]:
+        """Envia o frame ao runner e lê o resultado (roda em thread)."""
+        with runner.lock:
+            try:
+                runner.raw_sock.sendall(frame)
+            except OSError as e:
+                cls._discard_runner(session_id, runner)
+                raise _RunnerUnavailable(str(e)) from e
+            
+            return cls._read_runner_result(container, session_id, runner, timeout)
+
+    @classmethod
+    def _read_runner_result(cls, container, session_id: str, runner: _PythonRunner, timeout: int) -> tuple[int, str, str]:
+        """Lê stdout/stderr do runner até os dois sentinelas da execução atual."""
+        stdout_buf = bytearray()
+        stderr_buf = bytearray()
+        exit_code = None
+        stderr_done = False
+        
+        # Se a execução passar do timeout, o processo do runner é morto;
+        # o socket recebe EOF e a leitura abaixo termina
+        timer = threading.Timer(timeout, cls._kill_runner, args=(container, session_id, runner))
+        timer.daemon = True
+        timer.start()
+        
+        try:
+            for stream, payload in runner.frames:
+                if stream == STDERR:
+                    stderr_buf += payload
+                    if stderr_buf.endswith(runner.stderr_end):
+                        del stderr_buf[-len(runner.stderr_end):]
+                        stderr_done = True
+                else:
+                    stdout_buf += payload
+                    match = runner.stdout_end.search(stdout_buf)
+                    if match:
+                        exit_code = int(match.group(1))
+                        del stdout_buf[match.start():]
+                
+                if exit_code is not None and stderr_done:
+                    break
+            else:
+                # EOF: o processo do runner morreu (timeout ou os._exit no código do usuário)
+                cls._discard_runner(session_id, runner)
+                exit_code = -1
+        except Exception:
+            # Socket quebrado no meio da leitura (ou fechado por _kill_runner):
+            # o runner não é mais utilizável
+            cls._discard_runner(session_id, runner)
+            if not runner.timed_out:
+                raise
+            exit_code = -1
+        finally:
+            timer.cancel()
+        
+        if runner.timed_out and exit_code == -1:
+            stderr_buf += f"\n[Tempo limite de execução excedido ({timeout}s)]".encode()
+        
+        stdout_str = stdout_buf.decode('utf-8', errors='replace')
+        stderr_str = stderr_buf.decode('utf-8', errors='replace')
+        
+        return exit_code, stdout_str, stderr_str
+
+    @classmethod
+    def _discard_runner(cls, session_id: str, runner: _PythonRunner):
+        """Remove o runner do registro e fecha o socket."""
+        if cls._runners.get(session_id) is runner:
+            del cls._runners[session_id]
+        runner.close()
+
+    @classmethod
+    def _kill_runner(cls, container, session_id: str, runner: _PythonRunner):
+        """Mata o processo do runner (usado quando a execução excede o timeout)."""
+        logger.warning("Timeout no runner Python, encerrando", session_id=session_id)
+        runner.timed_out = True
+        try:
+            container.exec_run(["kill", "-9", str(runner.pid)])
+        except Exception as e:
+            logger.warning("Erro ao encerrar runner Python", session_id=session_id, error=str(e))
+            # Sem o kill, fechar o socket interrompe a leitura
+            runner.close()
+
     @classmethod
     async def execute_python_in_container(cls, session_id: str, code: str, timeout: int = 60) -> tuple[bool, str]:
         """
@@ -201,36 +890,25 @@ class ContainerSessionManager:
         Returns:
             (success, output)
         """
-        container = cls.get_or_create_container(session_id)
+        container = await cls.get_or_create_container(session_id)
         if not container:
             return False, "Docker não disponível ou erro ao criar container"
 
         try:
-            # Criar arquivo script temporário dentro do container via echo/bash
-            # Usando xxd para evitar problemas com aspas e escapes complexos
-            encoded_code = code.encode('utf-8').hex()
-            
-            # Comando para decodificar e salvar script.py
-            # Nota: usamos um nome aleatório para evitar colisão se rodar paralelo (embora session seja serial geralmente)
-            import uuid
-            script_name = f"script_{uuid.uuid4().hex[:8]}.py"
-            setup_cmd = f"/bin/bash -c 'echo {encoded_code} | xxd -r -p > /attr/data/{script_name}'"
-            
-            # ATENÇÃO: working_dir é /app/data, e volume montado também.
-            # Vamos salvar direto lá.
-            setup_cmd = f"/bin/bash -c 'if ! command -v xxd &> /dev/null; then apt-get update && apt-get install -y xxd; fi; echo {encoded_code} | xxd -r -p > {script_name}'"
-            
-            # Executar setup (criação do arquivo)
-            exit_code, out, err = await cls.execute_command(session_id, setup_cmd, timeout=10)
-            if exit_code != 0:
-                return False, f"Erro ao preparar script: {err}"
-            
-            # Executar python
-            run_cmd = f"python3 {script_name}"
-            exit_code, stdout, stderr = await cls.execute_command(session_id, run_cmd, timeout=timeout)
-            
-            # Limpar script
-            await cls.execute_command(session_id, f"rm {script_name}")
+            # O código é enviado ao runner Python persistente da sessão
+            # (sem subir um interpretador novo a cada execução)
+            try:
+                exit_code, stdout, stderr = await cls._run_in_runner(container, session_id, code, timeout)
+            except _RunnerUnavailable as runner_err:
+                # Fallback: python3 avulso lendo o código pelo stdin. Só quando
+                # o código não chegou ao runner, para nunca executá-lo duas vezes
+                logger.warning("Runner Python indisponível, usando execução avulsa", error=str(runner_err))
+                exit_code, stdout, stderr = await asyncio.to_thread(
+                    cls._exec_with_restart_sync,
+                    container,
+                    ["python3", "-u", "-"],
+                    code.encode('utf-8')
+                )
             
             output = stdout
             if stderr:
@@ -242,5 +920,6 @@ class ContainerSessionManager:
             return True, output
 
         except Exception as e:
+            cls._forget_container_on_error(session_id, e)
             return False, f"Erro interno ao executar Python: {str(e)}"
 
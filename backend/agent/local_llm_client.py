@@ -8,11 +8,36 @@ Orquestrador principal usando modelo local com fallback em cascata:
 =====================================================
 """
 
-from typing import Dict, Any, List, Optional
-from openai import AsyncOpenAI
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, List, Optional
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    RateLimitError,
+)
+from openai.types.chat import ChatCompletionChunk
 import asyncio
+import json
+import logging
+import random
+import time
+import httpx
+import itertools
+from os import urandom
 
 from config import get_settings, get_logger
+from agent.openrouter_client import tool_calls_soa
+
+__all__ = [
+    "LocalLLMClient",
+    "get_primary_llm_client",
+    "get_secondary_llm_client",
+    "get_local_llm_client",
+    "get_local_http_client",
+    "aclose_local_llm_clients",
+]
 
 # -------------------------------------------------
 # Configuração
@@ -20,59 +45,268 @@ from config import get_settings, get_logger
 logger = get_logger(__name__)
 settings = get_settings()
 
-# Clientes singleton para cada modelo
-_primary_client: Optional[AsyncOpenAI] = None
-_secondary_client: Optional[AsyncOpenAI] = None
+# Cliente único para o servidor Ollama, usado pelos modelos primário e
+# secundário (o timeout de cada modelo é passado por chamada)
+_local_client: Optional[AsyncOpenAI] = None
 
+# Pool HTTP do cliente local. O Ollama atende poucas requisições em
+# paralelo; manter poucas conexões vivas por bastante tempo evita reabrir
+# conexão a cada chamada do agente.
+_http_client: Optional[httpx.AsyncClient] = None
 
-def get_primary_llm_client() -> AsyncOpenAI:
+# Decoder para achar tool calls que o gemma3-tools escreve como texto:
+# {"name": "...", "parameters": {...}} (parameters pode ter objetos aninhados)
+_JSON_DECODER = json.JSONDecoder()
+
+def _iter_json_objects(content: str):
+    """
+    Gera os objetos JSON (dicts) encontrados no texto, usando raw_decode a
+    partir de cada "{" (suporta objetos aninhados, que uma regex não cobre).
+    """
+    i = content.find("{")
+    while i != -1:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(content, i)
+        except json.JSONDecodeError:
+            i = content.find("{", i + 1)
+            continue
+        i = content.find("{", end)
+        if isinstance(obj, dict):
+            yield obj
+
+
+# IDs de tool call: tokens aleatórios gerados uma vez no import e usados em
+# rodízio, sem syscall por tool call. O tool_call_id fica no histórico da
+# conversa (entre requisições), então o ID também leva a volta do rodízio
+# (n >> 8) e não se repete dentro do processo.
+_CALL_ID_RING = [urandom(4).hex() for _ in range(256)]
+_CALL_ID_SEQ = itertools.count()
+
+
+def _to_tool_call(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte {"name", "parameters"} no formato padrão de tool call."""
+    n = next(_CALL_ID_SEQ)
+    return {
+        "id": f"call_{_CALL_ID_RING[n & 0xFF]}{n >> 8:x}",
+        "type": "function",
+        "function": {
+            "name": obj["name"],
+            "arguments": json.dumps(obj["parameters"])
+        }
+    }
+
+
+# Modelo -> é gemma3-tools (tool calls no texto em vez da API)
+_GEMMA_TOOLS_CACHE: Dict[str, bool] = {}
+
+
+def _is_gemma_tools(model: str) -> bool:
+    """Verifica (com cache por nome de modelo) se o modelo é gemma3-tools."""
+    is_gemma = _GEMMA_TOOLS_CACHE.get(model)
+    if is_gemma is None:
+        is_gemma = _GEMMA_TOOLS_CACHE[model] = "gemma3-tools" in model.lower()
+    return is_gemma
+
+
+class _PrimaryBreaker:
     """
-    Retorna cliente OpenAI configurado para o modelo primário (Gemma 3 4B).
+    Circuit breaker do modelo primário.
     
-    Returns:
-        Cliente AsyncOpenAI com timeout de 3 minutos
+    Após fail_threshold falhas seguidas o circuito abre (OPEN) e as
+    chamadas vão direto ao secundário, sem esperar o timeout do primário.
+    Passados recovery segundos, uma única chamada de teste é liberada
+    (HALF_OPEN) e as demais continuam indo ao secundário até ela terminar:
+    sucesso fecha o circuito, falha abre de novo. Se o teste não reportar
+    resultado (chamada cancelada), outro é liberado após recovery segundos.
     """
-    global _primary_client
     
-    if _primary_client is None:
-        _primary_client = AsyncOpenAI(
-            base_url=settings.local_llm_base_url,
-            api_key=settings.local_llm_api_key,
-            timeout=settings.primary_llm_timeout
-        )
-        logger.info(
-            "Cliente LLM primário inicializado",
-            base_url=settings.local_llm_base_url,
-            model=settings.primary_llm_model,
-            timeout=settings.primary_llm_timeout
+    fail_threshold = 3
+    recovery = 60.0
+    
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = "CLOSED"
+        # Início da chamada de teste em andamento (0 = nenhuma)
+        self.trial_started_at = 0.0
+    
+    def allow(self) -> bool:
+        if self.state == "CLOSED":
+            return True
+        now = time.monotonic()
+        if self.state == "OPEN":
+            if now - self.opened_at < self.recovery:
+                return False
+            self.state = "HALF_OPEN"
+        if self.trial_started_at and now - self.trial_started_at < self.recovery:
+            return False
+        self.trial_started_at = now
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        self.state = "CLOSED"
+        self.trial_started_at = 0.0
+    
+    def record_failure(self):
+        self.failures += 1
+        self.trial_started_at = 0.0
+        if self.state == "HALF_OPEN" or self.failures >= self.fail_threshold:
+            if self.state != "OPEN":
+                logger.warning("Circuito do modelo primário aberto", failures=self.failures)
+            self.state = "OPEN"
+            self.opened_at = time.monotonic()
+
+
+# Compartilhado por todas as instâncias de LocalLLMClient
+_primary_breaker = _PrimaryBreaker()
+
+
+def _tool_names(tools: Optional[List[Dict[str, Any]]]) -> frozenset:
+    """Nomes das tools do tipo function (calculado uma vez por chat_completion)."""
+    if not tools:
+        return frozenset()
+    return frozenset(t["function"]["name"] for t in tools if t.get("type") == "function")
+
+
+# Bulkhead: limite de chamadas simultâneas por modelo. O Ollama atende
+# poucas requisições por modelo ao mesmo tempo; o excedente espera aqui,
+# fora do prazo de geração, em vez de enfileirar dentro do servidor.
+_model_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _get_model_semaphore(model: str, limit: int) -> asyncio.Semaphore:
+    """Semáforo compartilhado do modelo (criado no primeiro uso)."""
+    sem = _model_semaphores.get(model)
+    if sem is None:
+        sem = _model_semaphores[model] = asyncio.Semaphore(max(limit, 1))
+    return sem
+
+
+# Retry dentro do mesmo modelo para falhas transitórias (conexão recusada
+# ou resetada, 429, 5xx do Ollama). Timeout não entra aqui: esse caso já
+# é tratado pelo fallback para o próximo modelo.
+LLM_RETRY_ATTEMPTS = 2
+LLM_RETRY_BASE_DELAY = 0.5
+LLM_RETRY_MAX_DELAY = 2.0
+
+
+def _is_transient_llm_error(e: Exception) -> bool:
+    """Conexão, 429 ou 5xx; 4xx (requisição inválida, auth...) não mudam com retry."""
+    if isinstance(e, APITimeoutError):
+        return False
+    if isinstance(e, (APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+async def _create_with_retry(client: AsyncOpenAI, model: str, **kwargs):
+    """
+    client.chat.completions.create com backoff exponencial e full jitter.
+    
+    Só repete a abertura da requisição; nada é repetido depois que o
+    stream começou a ser consumido.
+    """
+    for attempt in range(LLM_RETRY_ATTEMPTS):
+        try:
+            return await client.chat.completions.create(model=model, **kwargs)
+        except Exception as e:
+            if attempt == LLM_RETRY_ATTEMPTS - 1 or not _is_transient_llm_error(e):
+                raise
+            delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+            logger.warning(
+                "Falha transitória no LLM local, repetindo",
+                model=model,
+                attempt=attempt + 1,
+                delay=round(delay, 3),
+                error=str(e) or type(e).__name__
+            )
+            await asyncio.sleep(delay)
+
+
+# Último resultado do health_check: (instante monotônico, disponível)
+HEALTH_CACHE_TTL = 5.0
+_health_cache: Optional[tuple] = None
+
+
+def get_local_http_client() -> httpx.AsyncClient:
+    """
+    Retorna o httpx.AsyncClient compartilhado para o LLM local.
+    
+    O timeout de cada requisição é definido pelos clientes AsyncOpenAI.
+    """
+    global _http_client
+    
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=8,
+                max_keepalive_connections=8,
+                keepalive_expiry=300
+            )
         )
     
-    return _primary_client
+    return _http_client
 
 
-def get_secondary_llm_client() -> AsyncOpenAI:
+async def aclose_local_llm_clients():
+    """Fecha o pool HTTP do LLM local (chamado no shutdown da aplicação)."""
+    global _http_client, _local_client
+    
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _local_client = None
+
+
+def _get_shared_llm_client() -> AsyncOpenAI:
     """
-    Retorna cliente OpenAI configurado para o modelo secundário (Llama3.2).
+    Retorna o AsyncOpenAI compartilhado pelos modelos locais.
     
-    Returns:
-        Cliente AsyncOpenAI com timeout de 5 minutos
+    Primário e secundário rodam no mesmo servidor; um cliente só evita
+    dois pools de conexão disputando o mesmo backend.
     """
-    global _secondary_client
+    global _local_client
     
-    if _secondary_client is None:
-        _secondary_client = AsyncOpenAI(
+    if _local_client is None:
+        _local_client = AsyncOpenAI(
             base_url=settings.local_llm_base_url,
             api_key=settings.local_llm_api_key,
-            timeout=settings.secondary_llm_timeout
+            http_client=get_local_http_client(),
+            # Retries ficam em _create_with_retry (o padrão do SDK também
+            # repetiria timeouts, multiplicando o prazo de cada modelo)
+            max_retries=0
         )
         logger.info(
-            "Cliente LLM secundário inicializado",
+            "Cliente LLM local inicializado",
             base_url=settings.local_llm_base_url,
-            model=settings.secondary_llm_model,
-            timeout=settings.secondary_llm_timeout
+            primary_model=settings.primary_llm_model,
+            secondary_model=settings.secondary_llm_model
         )
     
-    return _secondary_client
+    return _local_client
+
+
+def get_primary_llm_client() -> AsyncOpenAI:
+    """
+    Retorna cliente OpenAI para o modelo primário (Gemma 3 4B).
+    
+    Returns:
+        Cliente AsyncOpenAI compartilhado (timeout de 3 minutos é
+        aplicado por chamada)
+    """
+    return _get_shared_llm_client()
+
+
+def get_secondary_llm_client() -> AsyncOpenAI:
+    """
+    Retorna cliente OpenAI para o modelo secundário (Llama3.2).
+    
+    Returns:
+        Cliente AsyncOpenAI compartilhado (timeout de 5 minutos é
+        aplicado por chamada)
+    """
+    return _get_shared_llm_client()
 
 
 # Manter compatibilidade com código antigo
@@ -118,6 +352,12 @@ class LocalLLMClient:
         self.secondary_model = settings.secondary_llm_model
         self.secondary_timeout = settings.secondary_llm_timeout
         
+        # Bulkheads por modelo (compartilhados entre instâncias)
+        self._semaphores = {
+            self.secondary_model: _get_model_semaphore(self.secondary_model, settings.secondary_llm_concurrency),
+            self.primary_model: _get_model_semaphore(self.primary_model, settings.primary_llm_concurrency),
+        }
+        
         # Para manter compatibilidade com código antigo
         self.client = self.primary_client
         self.model = model or self.primary_model
@@ -131,54 +371,18 @@ class LocalLLMClient:
             secondary_timeout=self.secondary_timeout
         )
     
-    async def _call_model(
+    def _log_prompt(
         self,
-        client: AsyncOpenAI,
         model: str,
         timeout: int,
         messages: List[Dict[str, Any]],
-        tools: Optional[List[Dict[str, Any]]] = None,
-        temperature: float = 0.7,
-        max_tokens: int = 4096
-    ) -> Dict[str, Any]:
-        """
-        Faz chamada para um modelo específico.
-        
-        Args:
-            client: Cliente AsyncOpenAI configurado
-            model: Nome do modelo
-            timeout: Timeout em segundos
-            messages: Lista de mensagens
-            tools: Lista de tools disponíveis
-            temperature: Temperatura de geração
-            max_tokens: Máximo de tokens na resposta
-            
-        Returns:
-            Dicionário com resposta formatada
-            
-        Raises:
-            asyncio.TimeoutError: Se exceder timeout
-            Exception: Para outros erros
-        """
-        # Verificar se é modelo gemma3-tools (retorna tool calls como texto)
-        is_gemma_tools = "gemma3-tools" in model.lower()
-        
-        # Preparar argumentos
-        kwargs = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens
-        }
+        is_gemma_tools: bool
+    ):
+        """Registra no log (DEBUG) o prompt enviado ao modelo."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
         
-        # Para gemma3-tools, NÃO enviamos tools via API
-        # O modelo recebe as tools no system prompt e retorna JSON como texto
-        if tools and not is_gemma_tools:
-            kwargs["tools"] = tools
-            kwargs["tool_choice"] = "auto"
-        
-        # Log detalhado do prompt sendo enviado
-        logger.info(
+        logger.debug(
             "=== PROMPT ENVIADO PARA LLM LOCAL ===",
             model=model,
             timeout=timeout,
@@ -189,62 +393,220 @@ class LocalLLMClient:
             content = msg.get("content", "")
             # Truncar conteúdo muito longo para o log
             content_preview = content[:500] + "..." if len(content) > 500 else content
-            logger.info(
+            logger.debug(
                 f"Mensagem [{i}]",
                 role=role,
                 content=content_preview
             )
-        logger.info("=== FIM DO PROMPT ===")
+        logger.debug("=== FIM DO PROMPT ===")
+    
+    @asynccontextmanager
+    async def _model_slot(self, model: str):
+        """
+        Ocupa uma vaga do bulkhead do modelo enquanto durar a chamada.
+        A espera na fila é registrada à parte do tempo de geração.
+        """
+        sem = self._semaphores.get(model)
+        if sem is None:
+            yield
+            return
         
-        # Fazer requisição com timeout
-        response = await asyncio.wait_for(
-            client.chat.completions.create(**kwargs),
-            timeout=timeout
+        started = time.monotonic()
+        async with sem:
+            queue_wait = time.monotonic() - started
+            if queue_wait >= 1.0:
+                logger.info("Aguardou vaga no modelo local", model=model, queue_wait=round(queue_wait, 2))
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Vaga no modelo local", model=model, queue_wait=round(queue_wait, 3))
+            yield
+    
+    async def _stream_model(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        timeout: int,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        hold_slot: bool = True
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        """
+        Faz chamada em streaming para um modelo específico.
+        
+        O timeout é o do httpx (conexão e cada leitura do stream); os
+        chunks são repassados conforme o modelo gera. Com hold_slot, a
+        vaga do bulkhead do modelo é ocupada até o fim do stream (quem
+        chama pode passar False se já estiver com a vaga).
+        
+        Yields:
+            ChatCompletionChunk do SDK OpenAI
+        """
+        if hold_slot:
+            async with self._model_slot(model):
+                async for chunk in self._stream_model(
+                    client, model, timeout, messages, tools, temperature, max_tokens,
+                    hold_slot=False
+                ):
+                    yield chunk
+            return
+        
+        # Para gemma3-tools, NÃO enviamos tools via API
+        # O modelo recebe as tools no system prompt e retorna JSON como texto
+        is_gemma_tools = _is_gemma_tools(model)
+        send_tools = bool(tools) and not is_gemma_tools
+        
+        self._log_prompt(model, timeout, messages, is_gemma_tools)
+        
+        # Timeout nativo do SDK (repassado ao httpx), sem task extra do wait_for.
+        # As tools (já dicts prontos, iguais a cada iteração do agente) vão
+        # pelo extra_body, que o SDK repassa ao JSON sem percorrer o schema.
+        stream = await _create_with_retry(
+            client,
+            model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            timeout=timeout,
+            extra_body={"tools": tools, "tool_choice": "auto"} if send_tools else None
         )
+        # Fecha a resposta ao sair (fim, erro ou cancelamento): com a conexão
+        # encerrada o Ollama interrompe a geração em vez de continuar na GPU
+        async with stream:
+            async for chunk in stream:
+                yield chunk
+    
+    async def _accumulate_stream(
+        self,
+        chunks: AsyncIterator[ChatCompletionChunk],
+        model: str,
+        tool_names: frozenset = frozenset()
+    ) -> Dict[str, Any]:
+        """
+        Junta os deltas de um stream na resposta formatada completa.
         
-        # Extrair resposta
-        choice = response.choices[0]
-        message = choice.message
-        content = message.content or ""
+        tool_names são os nomes válidos para tool calls escritos como texto
+        (gemma3-tools); ver _tool_names.
         
-        # Formatar resposta
-        result = {
-            "content": content,
-            "role": "assistant"
-        }
+        Returns:
+            Dicionário com resposta formatada (mesmo formato de _call_model)
+        """
+        content_parts: List[str] = []
+        # Deltas de tool calls chegam fragmentados e indexados por posição.
+        # Cada tool call já é montado no formato final; só os fragmentos de
+        # argumentos ficam à parte até o fim do stream.
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        argument_parts: Dict[int, List[str]] = {}
+        
+        async for chunk in chunks:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content_parts.append(delta.content)
+            if not delta.tool_calls:
+                continue
+            for tc in delta.tool_calls:
+                call = tool_calls.get(tc.index)
+                if call is None:
+                    call = tool_calls[tc.index] = {
+                        "id": tc.id,
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""}
+                    }
+                    argument_parts[tc.index] = []
+                elif tc.id:
+                    call["id"] = tc.id
+                if tc.function:
+                    if tc.function.name:
+                        call["function"]["name"] += tc.function.name
+                    if tc.function.arguments:
+                        argument_parts[tc.index].append(tc.function.arguments)
+        
+        content = "".join(content_parts)
+        
+        tool_calls_list = None
         
         # Para gemma3-tools, parsear tool calls do texto
-        if is_gemma_tools and tools:
-            parsed_tool_calls = self._parse_tool_calls_from_text(content, tools)
-            if parsed_tool_calls:
-                result["tool_calls"] = parsed_tool_calls
+        if tool_names and _is_gemma_tools(model):
+            tool_calls_list = self._parse_tool_calls_from_text(content, tool_names)
+            if tool_calls_list:
                 # Limpar o JSON do conteúdo se encontrou tool calls
-                result["content"] = ""
+                content = ""
                 logger.info(
                     "Tool calls parseados do texto",
-                    count=len(parsed_tool_calls)
+                    count=len(tool_calls_list)
                 )
         
         # Processar tool calls nativos se existirem (para outros modelos)
-        elif message.tool_calls:
-            result["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": "function",
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments
-                    }
-                }
-                for tc in message.tool_calls
-            ]
+        elif tool_calls:
+            for index, call in tool_calls.items():
+                call["function"]["arguments"] = "".join(argument_parts[index])
+            tool_calls_list = list(tool_calls.values())
+        
+        # Formatar resposta (montada de uma vez)
+        if not tool_calls_list:
+            return {"content": content, "role": "assistant"}
+        return {
+            "content": content,
+            "role": "assistant",
+            "tool_calls": tool_calls_list,
+            "tool_calls_soa": tool_calls_soa(tool_calls_list)
+        }
+    
+    async def _call_model(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        timeout: int,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        tool_names: Optional[frozenset] = None
+    ) -> Dict[str, Any]:
+        """
+        Faz chamada para um modelo específico e aguarda a resposta completa.
+        
+        Usa o mesmo caminho em streaming de _stream_model, acumulando os
+        deltas até o fim da geração.
+        
+        Args:
+            client: Cliente AsyncOpenAI configurado
+            model: Nome do modelo
+            timeout: Timeout em segundos
+            messages: Lista de mensagens
+            tools: Lista de tools disponíveis
+            temperature: Temperatura de geração
+            max_tokens: Máximo de tokens na resposta
+            tool_names: Nomes das tools já calculados (evita recalcular a
+                cada modelo da cascata)
+            
+        Returns:
+            Dicionário com resposta formatada
+            
+        Raises:
+            APITimeoutError / asyncio.TimeoutError: Se exceder timeout
+            Exception: Para outros erros
+        """
+        if tool_names is None:
+            tool_names = _tool_names(tools)
         
-        return result
+        # A espera pela vaga do modelo fica fora do prazo de geração
+        async with self._model_slot(model):
+            chunks = self._stream_model(
+                client, model, timeout, messages, tools, temperature, max_tokens,
+                hold_slot=False
+            )
+            # Limite para a geração completa; asyncio.timeout não cria task extra
+            async with asyncio.timeout(timeout):
+                return await self._accumulate_stream(chunks, model, tool_names)
     
     def _parse_tool_calls_from_text(
         self,
         content: str,
-        available_tools: List[Dict[str, Any]]
+        available_tool_names: frozenset
     ) -> List[Dict[str, Any]]:
         """
         Parseia tool calls do texto da resposta do modelo gemma3-tools.
@@ -254,53 +616,25 @@ class LocalLLMClient:
         
         Args:
             content: Texto da resposta do modelo
-            available_tools: Lista de tools disponíveis
+            available_tool_names: Nomes das tools disponíveis (ver _tool_names)
             
         Returns:
             Lista de tool calls no formato padrão
         """
-        import json
-        import re
-        import uuid
-        
-        tool_calls = []
+        tool_calls = [
+            _to_tool_call(obj)
+            for obj in _iter_json_objects(content)
+            if "parameters" in obj
+            and isinstance(obj.get("name"), str)
+            and obj["name"] in available_tool_names
+        ]
         
-        # Extrair nomes das tools disponíveis
-        available_tool_names = set()
-        for tool in available_tools:
-            if tool.get("type") == "function":
-                available_tool_names.add(tool["function"]["name"])
-        
-        # Tentar encontrar JSON no texto
-        # Padrão: {"name": "...", "parameters": {...}}
-        json_pattern = r'\{[^{}]*"name"\s*:\s*"[^"]+"\s*,\s*"parameters"\s*:\s*\{[^{}]*\}[^{}]*\}'
-        
-        matches = re.findall(json_pattern, content, re.DOTALL)
-        
-        for match in matches:
-            try:
-                parsed = json.loads(match)
-                tool_name = parsed.get("name", "")
-                parameters = parsed.get("parameters", {})
-                
-                # Verificar se é uma tool válida
-                if tool_name in available_tool_names:
-                    tool_calls.append({
-                        "id": f"call_{uuid.uuid4().hex[:8]}",
-                        "type": "function",
-                        "function": {
-                            "name": tool_name,
-                            "arguments": json.dumps(parameters)
-                        }
-                    })
-                    logger.debug(
-                        "Tool call parseado",
-                        name=tool_name,
-                        parameters=list(parameters.keys())
-                    )
-            except json.JSONDecodeError as e:
-                logger.debug("Falha ao parsear JSON", match=match[:100], error=str(e))
-                continue
+        if tool_calls and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Tool calls parseados",
+                count=len(tool_calls),
+                names=[tc["function"]["name"] for tc in tool_calls]
+            )
         
         return tool_calls
     
@@ -331,52 +665,71 @@ class LocalLLMClient:
         Raises:
             Exception: Se ambos os modelos locais falharem
         """
-        logger.debug(
-            "Enviando para LLM local",
-            messages_count=len(messages),
-            tools_count=len(tools) if tools else 0
-        )
+        # Logs por requisição só em DEBUG (evita montar kwargs à toa)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(
+                "Enviando para LLM local",
+                messages_count=len(messages),
+                tools_count=len(tools) if tools else 0
+            )
         
-        # Tentar modelo primário (Gemma 3 4B)
-        try:
+        # Nomes das tools calculados uma vez para toda a cascata
+        tool_names = _tool_names(tools)
+        
+        # Tentar modelo primário (Gemma 3 4B), a menos que o circuito
+        # esteja aberto por falhas seguidas
+        if not _primary_breaker.allow():
             logger.info(
-                "Tentando modelo primário",
-                model=self.primary_model,
-                timeout=self.primary_timeout
-            )
-            
-            result = await self._call_model(
-                client=self.primary_client,
-                model=self.primary_model,
-                timeout=self.primary_timeout,
-                messages=messages,
-                tools=tools,
-                temperature=temperature,
-                max_tokens=max_tokens
+                "Modelo primário em circuito aberto, indo direto ao secundário",
+                primary_model=self.primary_model
             )
+        else:
+            try:
+                if debug:
+                    logger.debug(
+                        "Tentando modelo primário",
+                        model=self.primary_model,
+                        timeout=self.primary_timeout
+                    )
             
-            logger.info(
-                "Resposta do modelo primário recebida",
-                model=self.primary_model,
-                content_length=len(result["content"]),
-                tool_calls=len(result.get("tool_calls", []))
-            )
+                result = await self._call_model(
+                    client=self.primary_client,
+                    model=self.primary_model,
+                    timeout=self.primary_timeout,
+                    messages=messages,
+                    tools=tools,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    tool_names=tool_names
+                )
             
-            return result
+                if debug:
+                    logger.debug(
+                        "Resposta do modelo primário recebida",
+                        model=self.primary_model,
+                        content_length=len(result["content"]),
+                        tool_calls=len(result.get("tool_calls", []))
+                    )
+                
+                _primary_breaker.record_success()
+                return result
             
-        except asyncio.TimeoutError:
-            logger.warning(
-                "Timeout no modelo primário, tentando secundário",
-                primary_model=self.primary_model,
-                primary_timeout=self.primary_timeout
-            )
+            except (APITimeoutError, asyncio.TimeoutError):
+                _primary_breaker.record_failure()
+                logger.warning(
+                    "Timeout no modelo primário, tentando secundário",
+                    primary_model=self.primary_model,
+                    primary_timeout=self.primary_timeout
+                )
             
-        except Exception as e:
-            logger.warning(
-                "Erro no modelo primário, tentando secundário",
-                primary_model=self.primary_model,
-                error=str(e)
-            )
+            except Exception as e:
+                _primary_breaker.record_failure()
+                logger.warning(
+                    "Erro no modelo primário, tentando secundário",
+                    primary_model=self.primary_model,
+                    error=str(e)
+                )
         
         # Tentar modelo secundário (Llama3.2)
         try:
@@ -393,19 +746,21 @@ class LocalLLMClient:
                 messages=messages,
                 tools=tools,
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                tool_names=tool_names
             )
             
-            logger.info(
-                "Resposta do modelo secundário recebida",
-                model=self.secondary_model,
-                content_length=len(result["content"]),
-                tool_calls=len(result.get("tool_calls", []))
-            )
+            if debug:
+                logger.debug(
+                    "Resposta do modelo secundário recebida",
+                    model=self.secondary_model,
+                    content_length=len(result["content"]),
+                    tool_calls=len(result.get("tool_calls", []))
+                )
             
             return result
             
-        except asyncio.TimeoutError:
+        except (APITimeoutError, asyncio.TimeoutError):
             logger.error(
                 "Timeout no modelo secundário também",
                 secondary_model=self.secondary_model,
@@ -427,49 +782,105 @@ class LocalLLMClient:
                 f"Modelos locais falharam. Erro: {str(e)}"
             )
     
+    async def chat_completion_stream(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4096
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        """
+        Versão em streaming de chat_completion.
+        
+        Repassa os chunks do modelo primário conforme são gerados. O
+        fallback para o secundário só acontece se o primário falhar antes
+        do primeiro chunk (depois disso a resposta já foi parcialmente
+        entregue e o erro é propagado).
+        
+        Use _accumulate_stream (com _tool_names(tools)) para obter a
+        resposta no formato de chat_completion a partir dos chunks.
+        
+        Yields:
+            ChatCompletionChunk do SDK OpenAI
+        """
+        if _primary_breaker.allow():
+            primary = self._stream_model(
+                self.primary_client, self.primary_model, self.primary_timeout,
+                messages, tools, temperature, max_tokens
+            )
+            started = False
+            try:
+                async for chunk in primary:
+                    started = True
+                    yield chunk
+                _primary_breaker.record_success()
+                return
+            except Exception as e:
+                _primary_breaker.record_failure()
+                if started:
+                    raise
+                logger.warning(
+                    "Erro no modelo primário (stream), tentando secundário",
+                    primary_model=self.primary_model,
+                    error=str(e) or type(e).__name__
+                )
+        
+        async for chunk in self._stream_model(
+            self.secondary_client, self.secondary_model, self.secondary_timeout,
+            messages, tools, temperature, max_tokens
+        ):
+            yield chunk
+    
     async def health_check(self) -> bool:
         """
-        Verifica se pelo menos um LLM local está disponível.
+        Verifica se o servidor do LLM local está disponível.
+        
+        Consulta a listagem de modelos (GET /models, compatível com OpenAI
+        no Ollama) em vez de gerar tokens, para não carregar o modelo na
+        VRAM só para responder "está no ar?". A mesma listagem responde pelos
+        dois modelos de uma vez, sem sondar primário e secundário em
+        sequência. O resultado fica em cache por alguns segundos para
+        absorver rajadas de verificações.
         
         Returns:
-            True se pelo menos um modelo responder, False caso contrário
+            True se o servidor responder e listar o modelo primário ou o
+            secundário, False caso contrário
         """
-        # Testar modelo primário
-        try:
-            await asyncio.wait_for(
-                self.primary_client.chat.completions.create(
-                    model=self.primary_model,
-                    messages=[{"role": "user", "content": "ping"}],
-                    max_tokens=5
-                ),
-                timeout=10
-            )
-            logger.info("Modelo primário disponível", model=self.primary_model)
-            return True
-        except Exception as e:
-            logger.warning(
-                "Modelo primário indisponível",
-                model=self.primary_model,
-                error=str(e)
-            )
+        global _health_cache
+        
+        now = time.monotonic()
+        if _health_cache is not None and now - _health_cache[0] < HEALTH_CACHE_TTL:
+            return _health_cache[1]
         
-        # Testar modelo secundário
+        url = str(self.primary_client.base_url).rstrip("/") + "/models"
         try:
-            await asyncio.wait_for(
-                self.secondary_client.chat.completions.create(
-                    model=self.secondary_model,
-                    messages=[{"role": "user", "content": "ping"}],
-                    max_tokens=5
-                ),
-                timeout=10
-            )
-            logger.info("Modelo secundário disponível", model=self.secondary_model)
-            return True
-        except Exception as e:
-            logger.warning(
-                "Modelo secundário também indisponível",
-                model=self.secondary_model,
-                error=str(e)
-            )
+            response = await get_local_http_client().get(url, timeout=2.0)
+            if response.status_code != 200:
+                logger.warning("LLM local indisponível", status_code=response.status_code)
+                healthy = False
+            else:
+                body = response.json()
+                data = body.get("data") if isinstance(body, dict) else None
+                if not isinstance(data, list):
+                    # JSON válido mas fora do formato da listagem: conta como indisponível
+                    raise ValueError("listagem de modelos em formato inesperado")
+                available = {
+                    m["id"] for m in data
+                    if isinstance(m, dict) and isinstance(m.get("id"), str)
+                }
+                healthy = any(
+                    model in available or f"{model}:latest" in available
+                    for model in (self.primary_model, self.secondary_model)
+                )
+                if not healthy:
+                    logger.warning(
+                        "Nenhum modelo local carregado no servidor",
+                        primary_model=self.primary_model,
+                        secondary_model=self.secondary_model
+                    )
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("LLM local indisponível", error=str(e) or type(e).__name__)
+            healthy = False
         
-        return False
+        _health_cache = (now, healthy)
+        return healthy
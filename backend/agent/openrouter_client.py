@@ -5,9 +5,12 @@ Wrapper para API OpenRouter usando SDK OpenAI
 =====================================================
 """
 
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAioHttpClient, DefaultAsyncHttpxClient
 from typing import List, Dict, Any, Optional, AsyncGenerator
+import asyncio
 import json
+import logging
+import httpx
 
 from config import get_settings, get_logger
 
@@ -17,6 +20,96 @@ from config import get_settings, get_logger
 logger = get_logger(__name__)
 settings = get_settings()
 
+# Agrupamento do streaming: o texto acumulado é repassado quando passa de
+# STREAM_FLUSH_CHARS caracteres ou STREAM_FLUSH_INTERVAL segundos, em vez
+# de um yield (e um envio no WebSocket) por token
+STREAM_FLUSH_CHARS = 64
+STREAM_FLUSH_INTERVAL = 0.05
+
+# Limite de requisições simultâneas ao OpenRouter: o excedente espera aqui
+# (onde pode ser cancelado por timeout) em vez de parado dentro do pool HTTP
+_request_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_request_semaphore() -> asyncio.Semaphore:
+    """Semáforo compartilhado das requisições ao OpenRouter (criado no primeiro uso)."""
+    global _request_semaphore
+    
+    if _request_semaphore is None:
+        _request_semaphore = asyncio.Semaphore(max(settings.openrouter_max_concurrency, 1))
+    
+    return _request_semaphore
+
+
+def _with_cache_breakpoint(messages: List[Dict[str, Any]], model: str) -> List[Dict[str, Any]]:
+    """
+    Marca o fim do prefixo estável (system prompt) para o cache de prompt.
+    
+    OpenAI/Gemini fazem cache de prefixo automático; modelos Anthropic só
+    reaproveitam o prefixo até um bloco com cache_control explícito. Para
+    os demais modelos a lista volta sem alteração.
+    """
+    if not model.startswith("anthropic/") or not messages:
+        return messages
+    
+    first = messages[0]
+    if first.get("role") != "system" or not isinstance(first.get("content"), str):
+        return messages
+    
+    system = {
+        "role": "system",
+        "content": [{
+            "type": "text",
+            "text": first["content"],
+            "cache_control": {"type": "ephemeral"}
+        }]
+    }
+    return [system, *messages[1:]]
+
+
+def _make_http_client():
+    """
+    Transporte HTTP do cliente OpenRouter.
+    
+    Usa aiohttp (extra openai[aiohttp]), que segura melhor muitas chamadas
+    concorrentes que o httpx; sem o extra instalado, cai no httpx com
+    HTTP/2 (várias requisições multiplexadas numa conexão) e um pool maior
+    que o padrão, para as iterações do agente reaproveitarem a conexão TLS.
+    """
+    try:
+        return DefaultAioHttpClient()
+    except RuntimeError:
+        logger.warning("aiohttp indisponível, OpenRouter usando httpx")
+        return DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.openrouter_max_concurrency,
+                max_keepalive_connections=50,
+                keepalive_expiry=30.0
+            ),
+            # Leitura mantém o prazo padrão do SDK (gerações longas)
+            timeout=httpx.Timeout(600.0, connect=10.0)
+        )
+
+
+def tool_calls_soa(tool_calls: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Versão colunar (SoA) de uma lista de tool calls.
+    
+    O despacho percorre ids/nomes/argumentos em paralelo (zip) em vez de
+    navegar em cada dict aninhado; o formato em lista (tool_calls) continua
+    sendo o usado no histórico de mensagens.
+    
+    Returns:
+        {"ids": [...], "names": [...], "args": [...]} com os argumentos
+        ainda como string JSON
+    """
+    return {
+        "ids": [tc["id"] for tc in tool_calls],
+        "names": [tc["function"]["name"] for tc in tool_calls],
+        "args": [tc["function"]["arguments"] for tc in tool_calls]
+    }
+
 
 class OpenRouterClient:
     """
@@ -31,6 +124,7 @@ class OpenRouterClient:
         self.client = AsyncOpenAI(
             base_url="https://openrouter.ai/api/v1",
             api_key=settings.openrouter_api_key,
+            http_client=_make_http_client(),
             default_headers={
                 "HTTP-Referer": "https://zeus.ovictorfarias.com.br",
                 "X-Title": "Zeus AI Agent"
@@ -39,6 +133,10 @@ class OpenRouterClient:
         
         logger.info("Cliente OpenRouter inicializado")
     
+    async def aclose(self):
+        """Fecha a sessão HTTP do cliente."""
+        await self.client.close()
+    
     async def chat_completion(
         self,
         messages: List[Dict[str, Any]],
@@ -73,36 +171,39 @@ class OpenRouterClient:
             # Preparar parâmetros
             params = {
                 "model": model,
-                "messages": messages,
+                "messages": _with_cache_breakpoint(messages, model),
                 "temperature": temperature,
                 "max_tokens": max_tokens,
                 "stream": stream
             }
             
-            # Adicionar tools se fornecidas
+            # Adicionar tools se fornecidas. Vão pelo extra_body, que o SDK
+            # repassa ao JSON sem percorrer o schema a cada chamada
             if tools:
-                params["tools"] = tools
-                params["tool_choice"] = "auto"
+                params["extra_body"] = {"tools": tools, "tool_choice": "auto"}
             
-            # Log detalhado do prompt sendo enviado
-            logger.info(
-                "=== PROMPT ENVIADO PARA OPENROUTER ===",
-                model=model
-            )
-            for i, msg in enumerate(messages):
-                role = msg.get("role", "unknown")
-                content = msg.get("content", "")
-                # Truncar conteúdo muito longo para o log
-                content_preview = content[:500] + "..." if len(content) > 500 else content
-                logger.info(
-                    f"Mensagem [{i}]",
-                    role=role,
-                    content=content_preview
+            # Log detalhado do prompt sendo enviado (só em DEBUG: evita
+            # fatiar e formatar cada mensagem quando o nível está desligado)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "=== PROMPT ENVIADO PARA OPENROUTER ===",
+                    model=model
                 )
-            logger.info("=== FIM DO PROMPT ===")
+                for i, msg in enumerate(messages):
+                    role = msg.get("role", "unknown")
+                    content = msg.get("content", "")
+                    # Truncar conteúdo muito longo para o log
+                    content_preview = content[:500] + "..." if len(content) > 500 else content
+                    logger.debug(
+                        f"Mensagem [{i}]",
+                        role=role,
+                        content=content_preview
+                    )
+                logger.debug("=== FIM DO PROMPT ===")
             
             # Fazer requisição
-            response = await self.client.chat.completions.create(**params)
+            async with _get_request_semaphore():
+                response = await self.client.chat.completions.create(**params)
             
             # Processar resposta
             if stream:
@@ -165,6 +266,7 @@ class OpenRouterClient:
                     }
                     for tc in message.tool_calls
                 ]
+                result["tool_calls_soa"] = tool_calls_soa(result["tool_calls"])
             
             # === LOG DA RESPOSTA ===
             logger.info(
@@ -212,6 +314,10 @@ class OpenRouterClient:
         """
         Envia mensagens e retorna resposta em streaming.
         
+        Deltas de texto são agrupados (ver STREAM_FLUSH_CHARS e
+        STREAM_FLUSH_INTERVAL); deltas de tool calls e o chunk final saem
+        na hora, levando junto o texto pendente.
+        
         Yields:
             Chunks da resposta conforme são gerados
         """
@@ -224,27 +330,58 @@ class OpenRouterClient:
         try:
             params = {
                 "model": model,
-                "messages": messages,
+                "messages": _with_cache_breakpoint(messages, model),
                 "temperature": temperature,
                 "max_tokens": max_tokens,
                 "stream": True
             }
             
             if tools:
-                params["tools"] = tools
-                params["tool_choice"] = "auto"
+                params["extra_body"] = {"tools": tools, "tool_choice": "auto"}
             
-            stream = await self.client.chat.completions.create(**params)
-            
-            async for chunk in stream:
-                if chunk.choices:
-                    delta = chunk.choices[0].delta
+            # A vaga fica ocupada até o fim do stream (a conexão fica presa junto)
+            async with _get_request_semaphore():
+                stream = await self.client.chat.completions.create(**params)
+                
+                loop = asyncio.get_running_loop()
+                buffer: List[str] = []
+                buffered = 0
+                last_flush = loop.time()
+                
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
                     
-                    yield {
-                        "content": delta.content or "",
-                        "tool_calls": delta.tool_calls if hasattr(delta, "tool_calls") else None,
-                        "finish_reason": chunk.choices[0].finish_reason
-                    }
+                    choice = chunk.choices[0]
+                    delta = choice.delta
+                    tool_calls = delta.tool_calls if hasattr(delta, "tool_calls") else None
+                    
+                    if delta.content:
+                        buffer.append(delta.content)
+                        buffered += len(delta.content)
+                    
+                    if (
+                        tool_calls
+                        or choice.finish_reason is not None
+                        or buffered >= STREAM_FLUSH_CHARS
+                        or (buffer and loop.time() - last_flush >= STREAM_FLUSH_INTERVAL)
+                    ):
+                        yield {
+                            "content": "".join(buffer),
+                            "tool_calls": tool_calls,
+                            "finish_reason": choice.finish_reason
+                        }
+                        buffer.clear()
+                        buffered = 0
+                        last_flush = loop.time()
+            
+            # Texto que sobrou (stream terminou sem finish_reason)
+            if buffer:
+                yield {
+                    "content": "".join(buffer),
+                    "tool_calls": None,
+                    "finish_reason": None
+                }
             
             logger.info("Streaming concluído")
             
@@ -265,3 +402,12 @@ def get_openrouter_client() -> OpenRouterClient:
         _client = OpenRouterClient()
     
     return _client
+
+
+async def aclose_openrouter_client():
+    """Fecha a sessão HTTP do OpenRouter (chamado no shutdown da aplicação)."""
+    global _client
+    
+    if _client is not None:
+        await _client.aclose()
+    _client = None
@@ -7,13 +7,16 @@ Gerencia o ciclo de vida do agente e execução de tools
 
 from typing import Dict, Any, List, Optional, Callable
 from fastapi import WebSocket
+import re
 import json
 import asyncio
+import random
+import orjson
 
 from config import get_settings, get_logger
-from agent.openrouter_client import get_openrouter_client
+from agent.openrouter_client import get_openrouter_client, tool_calls_soa
 from agent.prompts import SYSTEM_PROMPT, RAG_CONTEXT_TEMPLATE
-from agent.tools import get_all_tools, execute_tool
+from agent.tools import get_all_tools, execute_tool, is_concurrency_safe, is_cacheable
 from agent.container_session_manager import ContainerSessionManager
 
 # -------------------------------------------------
@@ -38,6 +41,359 @@ def get_rag():
     return _rag_service if _rag_service else None
 
 
+# Primeira mensagem de toda chamada ao modelo (montada uma vez e
+# compartilhada; não deve ser alterada)
+_SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+
+def _api_message(msg) -> Dict[str, Any]:
+    """
+    Mensagem do histórico no formato da API.
+    
+    Objetos Message já se convertem (Message.to_api_dict); dicts avulsos
+    passam pelo adaptador abaixo.
+    """
+    if not isinstance(msg, dict):
+        return msg.to_api_dict()
+    
+    tool_calls = msg.get('tool_calls')
+    tool_call_id = msg.get('tool_call_id')
+    
+    # Papel já resolvido no literal (resposta de tool vira role "tool")
+    msg_dict = {
+        "role": "tool" if tool_call_id else msg.get('role'),
+        "content": msg.get('content', '')
+    }
+    if tool_calls:
+        msg_dict["tool_calls"] = tool_calls
+    if tool_call_id:
+        msg_dict["tool_call_id"] = tool_call_id
+    
+    return msg_dict
+
+
+def _parse_tool_args(tool_args_str: str) -> Dict[str, Any]:
+    """Faz o parse dos argumentos de um tool call (orjson, com fallbacks)."""
+    try:
+        return orjson.loads(tool_args_str)
+    except json.JSONDecodeError:
+        # Se falhar, tentar com sanitização mais agressiva
+        try:
+            # Tentar interpretar como string Python (que aceita mais escapes)
+            # e depois converter para JSON
+            sanitized = tool_args_str.encode('utf-8').decode('unicode_escape')
+            return json.loads(sanitized)
+        except Exception:
+            # Última tentativa: substituir escapes problemáticos manualmente
+            fixed = tool_args_str.replace('\\t', '\\\\t').replace('\\n', '\\\\n').replace('\\r', '\\\\r')
+            return json.loads(fixed)
+
+
+# Respostas de erro do OpenRouterClient que acionam retry/fallback
+_MODEL_ERROR_PREFIXES = (
+    "Erro: O modelo retornou uma resposta vazia",
+    "Erro: O modelo gerou tool calls malformados",
+)
+
+# Limite de iterações do ciclo de tool calling (evita loops infinitos)
+_MAX_AGENT_ITERS = 200
+
+# Quantas vezes seguidas o mesmo lote de tool calls pode falhar por inteiro
+# antes de o ciclo ser encerrado (o modelo está repetindo a chamada quebrada)
+_MAX_REPEATED_FAILURES = 2
+
+def _insert_rag_context(messages: List[Dict[str, Any]], rag_context: str):
+    """
+    Insere o contexto RAG logo antes da última mensagem do usuário.
+    
+    O contexto muda a cada consulta; fora do início da lista, o system
+    prompt e o histórico anterior continuam sendo um prefixo idêntico entre
+    chamadas e turnos (cache de prompt/KV do provedor).
+    """
+    position = len(messages)
+    for i in range(len(messages) - 1, 0, -1):
+        if messages[i]["role"] == "user":
+            position = i
+            break
+    messages.insert(position, {
+        "role": "system",
+        "content": RAG_CONTEXT_TEMPLATE.format(procedures=rag_context)
+    })
+
+
+# Histórico enviado ao modelo: saídas de tool acima do limite são cortadas e,
+# quando o ciclo acumula mais que a janela, as saídas antigas são resumidas
+TOOL_RESULT_MAX_CHARS = 16000
+TOOL_RESULT_SUMMARY_CHARS = 300
+MESSAGE_WINDOW = 40
+# Acima desse total de caracteres no histórico o resumo roda mesmo dentro da
+# janela (~60k tokens; saídas grandes enchem o contexto em poucas mensagens)
+CONTEXT_CHAR_BUDGET = 240_000
+_COMPACTED_MARK = "\n[... saída antiga resumida]"
+
+
+def _cap_tool_result(tool_result: str) -> str:
+    """Corta a saída de uma tool no tamanho que o modelo recebe."""
+    if len(tool_result) <= TOOL_RESULT_MAX_CHARS:
+        return tool_result
+    omitted = len(tool_result) - TOOL_RESULT_MAX_CHARS
+    return f"{tool_result[:TOOL_RESULT_MAX_CHARS]}\n[... saída truncada, {omitted} caracteres omitidos]"
+
+
+def _compact_tool_results(messages: List[Dict[str, Any]], compacted_upto: int) -> int:
+    """
+    Resume as saídas de tool fora das últimas MESSAGE_WINDOW // 2 mensagens.
+    
+    Só age quando há mais de MESSAGE_WINDOW mensagens depois do último corte,
+    para que o prefixo enviado ao provedor mude raramente (cache de prompt),
+    ou quando o histórico passa de CONTEXT_CHAR_BUDGET caracteres.
+    As mensagens continuam no lugar (cada tool_call_id mantém sua resposta);
+    só o conteúdo é encurtado.
+    
+    Returns:
+        Índice até onde o histórico já foi resumido
+    """
+    if len(messages) - compacted_upto <= MESSAGE_WINDOW:
+        total_chars = sum(
+            len(content) for content in (msg.get("content") for msg in messages)
+            if isinstance(content, str)
+        )
+        if total_chars <= CONTEXT_CHAR_BUDGET:
+            return compacted_upto
+    
+    cutoff = len(messages) - MESSAGE_WINDOW // 2
+    if cutoff <= compacted_upto:
+        return compacted_upto
+    for i in range(compacted_upto, cutoff):
+        msg = messages[i]
+        content = msg.get("content") or ""
+        if (
+            msg.get("role") == "tool"
+            and len(content) > TOOL_RESULT_SUMMARY_CHARS
+            and not content.endswith(_COMPACTED_MARK)
+        ):
+            # Dict novo: as mensagens do histórico podem ser compartilhadas
+            messages[i] = {**msg, "content": content[:TOOL_RESULT_SUMMARY_CHARS] + _COMPACTED_MARK}
+    
+    logger.debug("Saídas de tool antigas resumidas", upto=cutoff, messages_count=len(messages))
+    return cutoff
+
+
+# Mensagens que não justificam busca no RAG: só confirmações, saudações e
+# "continue" (sozinhos ou combinados, como "ok, obrigado!"). Mensagens curtas
+# com conteúdo ("instale ffmpeg", "baixe <url>") continuam buscando.
+_NO_RETRIEVAL_PATTERN = re.compile(
+    r"^\s*(?:(?:ok(?:ay)?|sim|n[ãa]o|obrigad[oa]|valeu|blz|beleza|certo|perfeito|"
+    r"continu[ea]|prossiga|pode seguir|oi|ol[áa]|bom dia|boa tarde|boa noite|"
+    r"thanks?|thank you|yes|no|go on)[\s,.!?]*)+$",
+    re.IGNORECASE
+)
+
+
+def _should_retrieve(message) -> bool:
+    """
+    Indica se vale buscar contexto no RAG para a mensagem do usuário.
+    
+    Mensagens vazias ou puramente conversacionais não trazem termos que
+    casem com procedimentos; o modelo ainda pode chamar search_procedures.
+    """
+    if not isinstance(message, str) or not message.strip():
+        return False
+    return not _NO_RETRIEVAL_PATTERN.match(message)
+
+
+# Quanto a primeira chamada ao modelo espera pelo contexto do RAG (segundos);
+# se a busca demorar mais, o contexto entra numa iteração seguinte
+RAG_CONTEXT_WAIT = 0.2
+
+# Tools que terminam antes disso (segundos) geram um único frame tool_done
+# no WebSocket, em vez do par tool_start/tool_result
+TOOL_START_DELAY = 0.05
+
+# Tasks em segundo plano (referência forte até terminarem, senão o GC pode
+# descartar a task no meio da execução)
+_background_tasks: set = set()
+
+
+class _ProcessingCancelled(Exception):
+    """O usuário cancelou o processamento durante uma espera."""
+
+
+async def _unless_cancelled(coro, cancel_state: Optional[Dict[str, Any]]):
+    """
+    Aguarda coro, interrompendo-a assim que cancel_state["event"] for sinalizado.
+    
+    Sem evento no cancel_state, só aguarda coro (o flag "cancelled" continua
+    sendo checado no início de cada iteração).
+    
+    Raises:
+        _ProcessingCancelled: se o cancelamento chegou antes de coro terminar
+    """
+    event = cancel_state.get("event") if cancel_state else None
+    if event is None:
+        return await coro
+    
+    task = asyncio.ensure_future(coro)
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        done, _ = await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    if task not in done:
+        raise _ProcessingCancelled()
+    return task.result()
+
+
+async def _persist_procedures(rag, procedures: List[Dict[str, Any]]):
+    """Grava no RAG os procedimentos executados (fora do caminho da resposta)."""
+    try:
+        # Todos os procedimentos numa só gravação (embeddings em lote)
+        await rag.add_procedures_bulk([
+            {
+                "description": f"Executou {proc['tool']} com argumentos: {proc['arg_names']}",
+                "solution": proc['result'],
+                "tool_used": proc['tool']
+            }
+            for proc in procedures
+        ])
+    except Exception as e:
+        logger.warning("Erro ao salvar procedimentos no RAG", error=str(e))
+
+
+def _dump_event(event: Dict[str, Any]) -> Optional[bytes]:
+    """
+    Serializa um evento do WebSocket com orjson.
+    
+    Chaves não-string são aceitas; valores sem suporte (set, objetos...)
+    viram str. Se ainda assim não for serializável, o evento é descartado
+    (retorna None) sem afetar os demais.
+    """
+    try:
+        return orjson.dumps(event, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        pass
+    try:
+        return orjson.dumps(event, default=str, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError as e:
+        logger.warning(
+            "Evento não serializável descartado",
+            event_type=str(event.get("type")),
+            error=str(e)
+        )
+        return None
+
+
+class _WSBatcher:
+    """
+    Agrupa os eventos enviados ao WebSocket durante um process_message.
+    
+    Tem o mesmo send_json do WebSocket (orquestrador e tools usam sem
+    mudança), mas só enfileira: o primeiro evento agenda um envio depois
+    de FLUSH_INTERVAL e tudo que chegar até lá sai num único frame
+    {"type": "batch", "events": [...]} (um evento sozinho sai como está).
+    Se um envio falhar (cliente desconectou), os eventos seguintes são
+    descartados.
+    """
+    
+    FLUSH_INTERVAL = 0.03
+    # Acima disso o lote é enviado sem esperar a janela
+    MAX_PENDING = 140
+    # Com o envio atrasado e essa fila acumulada, logs de progresso
+    # (backend_log) são descartados; os demais eventos sempre entram
+    MAX_PENDING_LOGS = 2 * MAX_PENDING
+    
+    def __init__(self, websocket: WebSocket):
+        self._ws = websocket
+        self._pending: List[Dict[str, Any]] = []
+        self._wake = asyncio.Event()
+        self._closed = False
+        # Envio em andamento; protegido do cancelamento de _task para que
+        # o lote já retirado de _pending não se perca no aclose
+        self._sending: Optional[asyncio.Task] = None
+        self._task = asyncio.create_task(self._run())
+    
+    async def send_json(self, payload: Dict[str, Any]):
+        if self._closed:
+            return
+        if len(self._pending) >= self.MAX_PENDING_LOGS and payload.get("type") == "backend_log":
+            return
+        self._pending.append(payload)
+        self._wake.set()
+    
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            if len(self._pending) < self.MAX_PENDING:
+                await asyncio.sleep(self.FLUSH_INTERVAL)
+            self._wake.clear()
+            await self.flush()
+    
+    async def flush(self):
+        """Envia agora os eventos pendentes."""
+        events, self._pending = self._pending, []
+        if not events or self._closed:
+            return
+        self._sending = asyncio.create_task(self._send(events))
+        await asyncio.shield(self._sending)
+    
+    async def _send(self, events: List[Dict[str, Any]]):
+        # Serializa evento a evento: um payload inválido não derruba o lote
+        # nem é confundido com cliente desconectado
+        parts = [p for p in map(_dump_event, events) if p is not None]
+        if not parts:
+            return
+        if len(parts) == 1:
+            frame = parts[0]
+        else:
+            frame = b'{"type":"batch","events":[' + b",".join(parts) + b"]}"
+        try:
+            # Frame de texto: o frontend faz JSON.parse do texto
+            await self._ws.send_text(frame.decode())
+        except Exception as e:
+            logger.debug("WebSocket indisponível, descartando eventos", error=str(e))
+            self._closed = True
+    
+    async def aclose(self):
+        """Para o envio periódico e entrega o que ainda estiver pendente."""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        # Um flush cancelado no meio do envio continua em _sending
+        if self._sending is not None:
+            await self._sending
+        await self.flush()
+        self._closed = True
+
+
+# Mensagens de status enviadas enquanto tools demoradas executam
+_HEARTBEAT_MESSAGES = (
+    "Ainda processando sua solicitação...",
+    "O processo continua em execução, aguarde...",
+    "Executando tarefa complexa...",
+    "Trabalhando nisso..."
+)
+
+
+async def _heartbeat(ws: "_WSBatcher"):
+    """Envia um status de "processando" a cada 15s até ser cancelado."""
+    try:
+        while True:
+            await asyncio.sleep(15)
+            await ws.send_json({
+                "type": "status",
+                "status": "processing",
+                "content": random.choice(_HEARTBEAT_MESSAGES)
+            })
+    except asyncio.CancelledError:
+        pass
+
+
 class AgentOrchestrator:
     """
     Orquestrador principal do agente Zeus.
@@ -64,6 +420,9 @@ class AgentOrchestrator:
         self.secondary_timeout = settings.secondary_model_timeout
         self.mago_timeout = settings.secondary_model_timeout  # Mesmo timeout do secundário
         
+        # Atraso até disparar o próximo modelo em paralelo (0 = sem hedging)
+        self.hedge_delay = settings.model_hedge_delay
+        
         logger.info(
             "Orquestrador inicializado",
             default_primary=self.default_primary_model,
@@ -87,39 +446,17 @@ class AgentOrchestrator:
         Returns:
             Lista de mensagens formatadas para API
         """
-        messages = []
-        
-        # System prompt com contexto RAG se disponível
-        system_content = SYSTEM_PROMPT
-        if rag_context:
-            system_content += "\n\n" + RAG_CONTEXT_TEMPLATE.format(
-                procedures=rag_context
-            )
-        
-        messages.append({
-            "role": "system",
-            "content": system_content
-        })
+        # System prompt fixo: mantém o mesmo prefixo em todas as chamadas,
+        # aproveitando o cache de prompt do provedor
+        messages = [_SYSTEM_MESSAGE]
         
         # Adicionar mensagens da conversa
-        for msg in conversation_messages:
-            msg_dict = {
-                "role": msg.role if hasattr(msg, 'role') else msg.get('role'),
-                "content": msg.content if hasattr(msg, 'content') else msg.get('content', '')
-            }
-            
-            # Adicionar tool_calls se existirem
-            tool_calls = msg.tool_calls if hasattr(msg, 'tool_calls') else msg.get('tool_calls')
-            if tool_calls:
-                msg_dict["tool_calls"] = tool_calls
-            
-            # Adicionar tool_call_id se for resposta de tool
-            tool_call_id = msg.tool_call_id if hasattr(msg, 'tool_call_id') else msg.get('tool_call_id')
-            if tool_call_id:
-                msg_dict["role"] = "tool"
-                msg_dict["tool_call_id"] = tool_call_id
-            
-            messages.append(msg_dict)
+        messages.extend(map(_api_message, conversation_messages))
+        
+        # Contexto RAG (varia por consulta) perto do turno atual, depois do
+        # prefixo estável
+        if rag_context:
+            _insert_rag_context(messages, rag_context)
         
         return messages
     
@@ -168,25 +505,22 @@ class AgentOrchestrator:
             try:
                 is_last_attempt = (attempt == max_attempts - 1)
                 
-                # Tentar chamar o modelo
-                response = await asyncio.wait_for(
-                    self.client.chat_completion(
+                # Tentar chamar o modelo (asyncio.timeout aplica o prazo na
+                # própria task, sem a task auxiliar do wait_for)
+                async with asyncio.timeout(timeout):
+                    response = await self.client.chat_completion(
                         messages=messages,
                         model=model,
                         tools=tools
-                    ),
-                    timeout=timeout
-                )
+                    )
                 
                 # Verificar se resposta é válida
                 content = response.get("content", "")
                 tool_calls = response.get("tool_calls")
                 
                 # Erros específicos retornados pelo client que devem acionar fallback
-                is_empty_error = isinstance(content, str) and "Erro: O modelo retornou uma resposta vazia" in content
-                is_malformed_tool_error = isinstance(content, str) and "Erro: O modelo gerou tool calls malformados" in content
-                
-                has_error = is_empty_error or is_malformed_tool_error
+                # (o client devolve a mensagem como conteúdo inteiro: basta o prefixo)
+                has_error = isinstance(content, str) and content.startswith(_MODEL_ERROR_PREFIXES)
                 
                 if (content or tool_calls) and not has_error:
                     # Sucesso! Resposta válida
@@ -194,28 +528,268 @@ class AgentOrchestrator:
                 
                 # Se chegou aqui, é resposta vazia/ruim
                 logger.warning(
-                    f"Resposta inválida/vazia do modelo {model}",
+                    "Resposta inválida/vazia do modelo",
+                    model=model,
                     attempt=attempt+1,
                     content_preview=str(content)[:100]
                 )
                 
                 if not is_last_attempt:
-                    logger.info(f"Tentando novamente {model} em 1s...")
+                    logger.info("Tentando novamente em 1s", model=model)
                     await asyncio.sleep(1)
                     continue
                 
             except asyncio.TimeoutError:
-                logger.warning(f"Timeout no modelo {model} (tentativa {attempt+1})")
+                logger.warning("Timeout no modelo", model=model, attempt=attempt+1)
                 if attempt < max_attempts - 1:
                     await asyncio.sleep(1)
                     
             except Exception as e:
-                logger.error(f"Erro no modelo {model} (tentativa {attempt+1}): {e}")
+                logger.error("Erro no modelo", model=model, attempt=attempt+1, error=str(e))
                 if attempt < max_attempts - 1:
                     await asyncio.sleep(1)
         
         return None # Falhou todas as tentativas
 
+    async def _call_model_ladder(self, ladder, messages, tools, websocket, progress_callback):
+        """
+        Percorre a escada de modelos (1ª Instância → 2ª Instância → Mago) com hedging.
+        
+        Se o modelo da vez não responde em hedge_delay segundos, o próximo é
+        disparado em paralelo; se falha, o próximo começa na hora. Vale a
+        primeira resposta válida e as chamadas restantes são canceladas.
+        
+        Args:
+            ladder: Lista de (rótulo, modelo, timeout) na ordem de preferência
+            
+        Returns:
+            (resposta, rótulo, modelo) ou (None, None, None) se todos falharem
+        """
+        loop = asyncio.get_running_loop()
+        running: Dict[asyncio.Task, int] = {}
+        next_index = 0
+        hedge_at = None
+        
+        def start_next():
+            nonlocal next_index, hedge_at
+            _, model, timeout = ladder[next_index]
+            task = asyncio.create_task(
+                self._call_model_with_retry(model=model, messages=messages, tools=tools, timeout=timeout)
+            )
+            running[task] = next_index
+            next_index += 1
+            hedge_at = loop.time() + self.hedge_delay if self.hedge_delay > 0 else None
+        
+        start_next()
+        try:
+            while running:
+                can_hedge = hedge_at is not None and next_index < len(ladder)
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=max(hedge_at - loop.time(), 0) if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    # Ninguém respondeu a tempo: disparar o próximo em paralelo
+                    slow_label, slow_model, _ = ladder[next_index - 1]
+                    label, model, _ = ladder[next_index]
+                    logger.warning(
+                        "Modelo demorando, disparando o próximo em paralelo",
+                        slow_instance=slow_label,
+                        slow_model=slow_model,
+                        instance=label,
+                        model=model
+                    )
+                    await self._send_log_feedback(
+                        websocket,
+                        f"{slow_model} demorando, tentando também {label} ({model})",
+                        progress_callback
+                    )
+                    start_next()
+                    continue
+                
+                for task in done:
+                    index = running.pop(task)
+                    response = task.result()
+                    if response:
+                        label, model, _ = ladder[index]
+                        return response, label, model
+                    
+                    failed_label, failed_model, _ = ladder[index]
+                    logger.warning("Modelo falhou", instance=failed_label, model=failed_model)
+                
+                if not running and next_index < len(ladder):
+                    # Todos os modelos em andamento falharam → próximo da escada
+                    failed_model = ladder[next_index - 1][1]
+                    label, model, _ = ladder[next_index]
+                    await self._send_log_feedback(
+                        websocket,
+                        f"Erro em {failed_model}, tentando {label} ({model})",
+                        progress_callback
+                    )
+                    start_next()
+            
+            return None, None, None
+        finally:
+            # Cancelar as chamadas perdedoras
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _run_tool_call(
+        self,
+        tool_id: str,
+        tool_name: str,
+        tool_args_str: str,
+        websocket: Optional[WebSocket],
+        progress_callback: Optional[Callable],
+        cancel_state: Optional[Dict[str, Any]],
+        session_id: Optional[str],
+        mago_model: str,
+        tool_memo: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> tuple:
+        """
+        Executa um tool call do modelo, notificando início e fim via WebSocket.
+        
+        Os tool calls de uma mesma resposta rodam concorrentemente
+        (asyncio.gather em process_message); cada um trata os próprios erros.
+        
+        tool_start só é enviado se a tool ainda estiver rodando após
+        TOOL_START_DELAY; tools mais rápidas (ou que falham antes de
+        executar) geram só um tool_done no fim.
+        
+        Com tool_memo, uma tool reaproveitável (is_cacheable) chamada de
+        novo com os mesmos argumentos devolve o resultado já obtido.
+        
+        Returns:
+            (tool_result, preview, result, arg_names): texto para o
+            histórico, trecho dele (até 500 caracteres), retorno bruto da
+            tool (None se falhou antes de executar) e nomes dos argumentos
+        """
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        start_sent = False
+        
+        # Inicializar variáveis antes do try para evitar erro de variável não definida
+        # se houver exceção antes de serem atribuídas
+        result = None
+        tool_args = {}
+        
+        try:
+            # Parse dos argumentos (com sanitização de escapes em _parse_tool_args)
+            tool_args = _parse_tool_args(tool_args_str)
+            
+            # Chave da chamada (antes dos argumentos injetados)
+            memo_key = None
+            if tool_memo is not None and is_cacheable(tool_name):
+                memo_key = f"{tool_name}|{orjson.dumps(tool_args, option=orjson.OPT_SORT_KEYS).decode()}"
+            
+            logger.info(
+                "Executando tool",
+                name=tool_name,
+                args=list(tool_args.keys())
+            )
+            await self._send_log_feedback(websocket, f"Executando: {tool_name}", progress_callback, "tool_start")
+            
+            tool_args["websocket"] = websocket
+            
+            # Passar cancel_state para tools que precisam verificar cancelamento
+            tool_args["cancel_state"] = cancel_state
+
+            # INJETAR SESSION_ID para isolamento
+            if session_id:
+                tool_args["session_id"] = session_id
+            
+            # INJETAR MODELO DO MAGO para a tool call_external_model
+            if tool_name == "call_external_model":
+                tool_args["mago_model"] = mago_model
+
+            if memo_key and memo_key in tool_memo:
+                # Mesma chamada já feita nesta mensagem: reaproveitar o resultado
+                result = tool_memo[memo_key]
+                logger.info("Resultado de tool reaproveitado", name=tool_name)
+            else:
+                # Executar a tool
+                exec_task = asyncio.ensure_future(execute_tool(tool_name, tool_args))
+                try:
+                    if websocket:
+                        await asyncio.wait({exec_task}, timeout=TOOL_START_DELAY)
+                        if not exec_task.done():
+                            # Notificar via WebSocket
+                            await websocket.send_json({
+                                "type": "tool_start",
+                                "tool": tool_name,
+                                "tool_id": tool_id
+                            })
+                            start_sent = True
+                    result = await exec_task
+                except asyncio.CancelledError:
+                    exec_task.cancel()
+                    raise
+                
+                if memo_key and result.get("success"):
+                    tool_memo[memo_key] = result
+            
+            logger.info(
+                "Tool executada",
+                name=tool_name,
+                success=result.get("success", False)
+            )
+            
+            # Formatar resultado
+            if result.get("success"):
+                tool_result = result.get("output", "Executado com sucesso")
+                await self._send_log_feedback(websocket, f"Tool {tool_name} executada com sucesso", progress_callback, "tool_end")
+            else:
+                tool_result = f"Erro: {result.get('error', 'Erro desconhecido')}"
+                await self._send_log_feedback(websocket, f"Erro na tool {tool_name}", progress_callback, "error")
+            
+        except json.JSONDecodeError as e:
+            tool_result = f"Erro ao parsear argumentos: {str(e)}"
+            logger.error("Erro ao parsear args da tool", error=str(e))
+            
+        except Exception as e:
+            tool_result = f"Erro ao executar: {str(e)}"
+            logger.error("Erro ao executar tool", error=str(e))
+        
+        # Trecho do resultado (limitado) usado no WebSocket e no RAG
+        preview = tool_result if len(tool_result) <= 500 else tool_result[:500]
+        
+        # Notificar resultado via WebSocket
+        if websocket:
+            if start_sent:
+                await websocket.send_json({
+                    "type": "tool_result",
+                    "tool": tool_name,
+                    "tool_id": tool_id,
+                    "result": preview
+                })
+            else:
+                await websocket.send_json({
+                    "type": "tool_done",
+                    "tool": tool_name,
+                    "tool_id": tool_id,
+                    "result": preview,
+                    "duration_ms": round((loop.time() - started_at) * 1000)
+                })
+        
+        return tool_result, preview, result, list(tool_args)
+    
+    async def _cancelled_response(self, conversation_id: str, iteration: int) -> Dict[str, Any]:
+        """Libera os recursos e monta a resposta de processamento cancelado."""
+        logger.info(
+            "Processamento cancelado pelo usuário",
+            iteration=iteration
+        )
+        await self.cleanup_resources(conversation_id)
+        return {
+            "content": "Processamento cancelado pelo usuário.",
+            "role": "assistant",
+            "cancelled": True
+        }
+    
     async def process_message(
         self,
         conversation,
@@ -239,13 +813,36 @@ class AgentOrchestrator:
             conversation: Objeto Conversation com mensagens
             websocket: WebSocket para enviar atualizações em tempo real
             custom_models: Modelos customizados {primary, secondary, mago}
-            cancel_state: Estado de cancelamento compartilhado {cancelled: bool, active_process: processo}
+            cancel_state: Estado de cancelamento compartilhado
+                          {cancelled: bool, active_process: processo, event: asyncio.Event opcional}
             progress_callback: Callback para enviar progresso (para background worker)
                                Assinatura: async def callback(message: str, step_type: str)
             
         Returns:
             Dicionário com resposta final
         """
+        # Eventos do WebSocket (orquestrador e tools) agrupados em lotes
+        if websocket:
+            websocket = _WSBatcher(websocket)
+        try:
+            return await self._process_message(
+                conversation, websocket, custom_models, cancel_state,
+                progress_callback, **kwargs
+            )
+        finally:
+            if websocket:
+                await websocket.aclose()
+    
+    async def _process_message(
+        self,
+        conversation,
+        websocket: Optional["_WSBatcher"],
+        custom_models: Optional[Dict[str, str]],
+        cancel_state: Optional[Dict[str, Any]],
+        progress_callback: Optional[Callable[[str, str], Any]],
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Corpo de process_message (websocket já é o _WSBatcher da chamada)."""
         # Determinar modelos a usar (customizados ou padrão)
         models = custom_models or {}
         primary_model = models.get("primary", self.default_primary_model)
@@ -260,56 +857,70 @@ class AgentOrchestrator:
             mago_model=mago_model
         )
         
-        # Buscar contexto do RAG
-        rag_context = None
+        # Buscar contexto do RAG em paralelo com a primeira chamada ao modelo
+        rag_task = None
         rag = get_rag()
         if rag:
-            try:
-                # Pegar última mensagem do usuário para buscar contexto
-                last_user_msg = None
-                for msg in reversed(conversation.messages):
-                    role = msg.role if hasattr(msg, 'role') else msg.get('role')
-                    if role == 'user':
-                        last_user_msg = msg.content if hasattr(msg, 'content') else msg.get('content', '')
-                        break
-                
-                if last_user_msg:
-                    rag_context = await rag.get_context_for_query(last_user_msg)
-                    if rag_context:
-                        logger.debug("Contexto RAG encontrado", length=len(rag_context))
-            except Exception as e:
-                logger.warning("Erro ao buscar contexto RAG", error=str(e))
+            # Pegar última mensagem do usuário para buscar contexto.
+            # Websocket e background worker anexam a mensagem do usuário
+            # logo antes de chamar process_message, então a busca
+            # normalmente para no primeiro item (o último do histórico).
+            last_user_msg = None
+            for msg in reversed(conversation.messages):
+                # Lê os campos direto, sem montar o dict da API por mensagem
+                if isinstance(msg, dict):
+                    role, content = msg.get('role'), msg.get('content', '')
+                else:
+                    role, content = msg.role, msg.content
+                if role == 'user':
+                    last_user_msg = content
+                    break
+            
+            if _should_retrieve(last_user_msg):
+                rag_task = asyncio.create_task(rag.get_context_for_query(last_user_msg))
+                _background_tasks.add(rag_task)
+                rag_task.add_done_callback(_background_tasks.discard)
         
-        # Construir mensagens
-        messages = self._build_messages(
-            conversation.messages,
-            rag_context
-        )
+        # Construir mensagens (o contexto RAG é inserido quando chegar)
+        messages = self._build_messages(conversation.messages)
+        compacted_upto = 0
         
         # Armazenar procedimentos executados para salvar no RAG
         executed_procedures = []
         
-        # Limitar número de iterações para evitar loops infinitos
-        max_iterations = 200
-        iteration = 0
+        # Resultados de tools só de leitura, reaproveitados se o modelo repetir a chamada
+        tool_memo: Dict[str, Dict[str, Any]] = {}
         
-        while iteration < max_iterations:
-            iteration += 1
-            
+        # Último lote que falhou por inteiro e quantas vezes seguidas se repetiu
+        failed_batch = None
+        failed_repeats = 0
+        
+        # Tools enviadas ao modelo (iguais em todas as iterações)
+        tools = self.tools or None
+        
+        for iteration in range(1, _MAX_AGENT_ITERS + 1):
             # -------------------------------------------------
             # VERIFICAÇÃO DE CANCELAMENTO
             # -------------------------------------------------
             if cancel_state and cancel_state.get("cancelled"):
-                logger.info(
-                    "Processamento cancelado pelo usuário",
-                    iteration=iteration
-                )
-                await self.cleanup_resources(conversation.id)
-                return {
-                    "content": "Processamento cancelado pelo usuário.",
-                    "role": "assistant",
-                    "cancelled": True
-                }
+                return await self._cancelled_response(conversation.id, iteration)
+            
+            # Contexto RAG: a primeira iteração espera até RAG_CONTEXT_WAIT;
+            # se ainda não chegou, segue sem e o contexto entra (antes da
+            # última mensagem do usuário) na primeira iteração em que estiver pronto
+            if rag_task is not None:
+                if iteration == 1:
+                    await asyncio.wait({rag_task}, timeout=RAG_CONTEXT_WAIT)
+                if rag_task.done():
+                    try:
+                        rag_context = rag_task.result()
+                    except Exception as e:
+                        logger.warning("Erro ao buscar contexto RAG", error=str(e))
+                    else:
+                        if rag_context:
+                            logger.debug("Contexto RAG encontrado", length=len(rag_context))
+                            _insert_rag_context(messages, rag_context)
+                    rag_task = None
             
             logger.info(
                 "Iteração do agente",
@@ -324,70 +935,40 @@ class AgentOrchestrator:
                 progress_callback
             )
             
-            # Tentar 1ª Instância (modelo primário)
-            response = await self._call_model_with_retry(
-                model=primary_model,
-                messages=messages,
-                tools=self.tools if self.tools else None,
-                timeout=self.primary_timeout
-            )
+            # 1ª Instância, com 2ª Instância e Mago como fallback/hedge
+            # (um cancelamento interrompe a espera pelo modelo na hora)
+            try:
+                response, instance, model = await _unless_cancelled(
+                    self._call_model_ladder(
+                        [
+                            ("1ª Instância", primary_model, self.primary_timeout),
+                            ("2ª Instância", secondary_model, self.secondary_timeout),
+                            ("Mago", mago_model, self.mago_timeout),
+                        ],
+                        messages, tools, websocket, progress_callback
+                    ),
+                    cancel_state
+                )
+            except _ProcessingCancelled:
+                return await self._cancelled_response(conversation.id, iteration)
             
             if response:
-                logger.info("Resposta da 1ª Instância recebida", model=primary_model)
-            else:
-                # Falha na 1ª Instância → Tentar 2ª Instância
-                logger.warning(
-                    "Falha na 1ª Instância, tentando 2ª Instância",
-                    primary_model=primary_model,
-                    secondary_model=secondary_model
-                )
-                await self._send_log_feedback(
-                    websocket,
-                    f"Erro em {primary_model}, tentando 2ª Instância ({secondary_model})",
-                    progress_callback
-                )
-                
-                response = await self._call_model_with_retry(
-                    model=secondary_model,
-                    messages=messages,
-                    tools=self.tools if self.tools else None,
-                    timeout=self.secondary_timeout
-                )
-                
-                if response:
-                    logger.info("Resposta da 2ª Instância recebida", model=secondary_model)
-                else:
-                    # Falha na 2ª Instância → Tentar Mago
-                    logger.warning(
-                        "Falha na 2ª Instância, tentando Mago",
-                        secondary_model=secondary_model,
-                        mago_model=mago_model
-                    )
+                logger.info("Resposta recebida", instance=instance, model=model)
+                if model != primary_model:
+                    # Fallback/hedge venceu: mostrar qual modelo respondeu
                     await self._send_log_feedback(
-                        websocket,
-                        f"Erro em {secondary_model}, tentando Mago ({mago_model})",
-                        progress_callback
-                    )
-                    
-                    response = await self._call_model_with_retry(
-                        model=mago_model,
-                        messages=messages,
-                        tools=self.tools if self.tools else None,
-                        timeout=self.mago_timeout
+                        websocket, f"Resposta de {instance} ({model})", progress_callback
                     )
-                    
-                    if response:
-                        logger.info("Resposta do Mago recebida", model=mago_model)
-                    else:
-                        # Falha total em todas as instâncias
-                        error_msg = f"Erro: Todos os modelos falharam (1ª: {primary_model}, 2ª: {secondary_model}, Mago: {mago_model})"
-                        logger.error("Falha em todas as instâncias")
-                        await self._send_log_feedback(websocket, "Erro: Falha em todas as instâncias", progress_callback, "error")
-                        await self.cleanup_resources(conversation.id)
-                        return {
-                            "content": error_msg,
-                            "role": "assistant"
-                        }
+            else:
+                # Falha total em todas as instâncias
+                error_msg = f"Erro: Todos os modelos falharam (1ª: {primary_model}, 2ª: {secondary_model}, Mago: {mago_model})"
+                logger.error("Falha em todas as instâncias")
+                await self._send_log_feedback(websocket, "Erro: Falha em todas as instâncias", progress_callback, "error")
+                await self.cleanup_resources(conversation.id)
+                return {
+                    "content": error_msg,
+                    "role": "assistant"
+                }
             
             # Resposta recebida
             await self._send_log_feedback(websocket, "Resposta recebida", progress_callback)
@@ -417,12 +998,11 @@ class AgentOrchestrator:
                 await self.cleanup_resources(conversation.id)
                 return response
             
+            # Ids/nomes/argumentos em colunas para o despacho
+            soa = response.get("tool_calls_soa") or tool_calls_soa(tool_calls)
+            
             # Verificar se alguma tool é finish_task
-            is_finished = False
-            for tc in tool_calls:
-                if tc["function"]["name"] == "finish_task":
-                    is_finished = True
-                    break
+            is_finished = "finish_task" in soa["names"]
             
             # Executar cada tool call
             logger.info(
@@ -438,192 +1018,117 @@ class AgentOrchestrator:
                 "tool_calls": tool_calls
             })
             
-            for tool_call in tool_calls:
-                tool_name = tool_call["function"]["name"]
-                tool_args_str = tool_call["function"]["arguments"]
-                tool_id = tool_call["id"]
-                
-                # Notificar via WebSocket
-                if websocket:
-                    await websocket.send_json({
-                        "type": "tool_start",
-                        "tool": tool_name,
-                        "tool_id": tool_id
-                    })
-                
-                # Inicializar variáveis antes do try para evitar erro de variável não definida
-                # se houver exceção antes de serem atribuídas
-                result = None
-                tool_args = {}
-                
-                try:
-                    # Parse dos argumentos com sanitização de escapes inválidos
-                    # Alguns modelos LLM retornam \t, \n literais que são inválidos em JSON
-                    def sanitize_json_string(s: str) -> str:
-                        """
-                        Corrige sequências de escape inválidas em JSON.
-                        Modelos LLM às vezes geram \\t, \\n literais (não escapados como \\\\t)
-                        que causam erro no json.loads.
-                        """
-                        import re
-                        # Substituir escapes inválidos por escapes válidos
-                        # Primeiro, duplicar barras antes de caracteres de escape inválidos
-                        # Isso transforma \t em \\t (escape válido)
-                        
-                        # Lista de caracteres que precisam de escape duplo
-                        # Excluímos os já válidos em JSON: \\, \", \n, \r, \t, \b, \f, \uXXXX
-                        # O problema é que \t dentro de uma string JSON deveria ser um tab,
-                        # mas se o modelo gerou literalmente "\t" (barra+t), precisamos escapar a barra
-                        
-                        # Detectar se a string tem escapes malformados tentando parsear
-                        try:
-                            json.loads(s)
-                            return s  # Já é válido
-                        except json.JSONDecodeError:
-                            pass
-                        
-                        # Tentar corrigir escapes inválidos
-                        # Substituir sequências de escape problemáticas dentro de strings JSON
-                        # Pattern: captura uma barra seguida de caractere que NÃO é escape válido
-                        # Escapes válidos em JSON: \\ \" \/ \b \f \n \r \t \uXXXX
-                        
-                        # Abordagem: substituir \\ por placeholder, corrigir, restaurar
-                        placeholder = "\x00ESCAPED_BACKSLASH\x00"
-                        s = s.replace("\\\\", placeholder)
-                        
-                        # Agora, barras simples restantes que precedem caracteres inválidos
-                        # devem ser escapadas. Mas primeiro, vamos tratar os casos comuns:
-                        # \t \n \r são válidos em JSON, o problema é quando o modelo
-                        # gera uma string literal com barra+t que não está dentro de aspas
-                        
-                        # Restaurar
-                        s = s.replace(placeholder, "\\\\")
-                        
-                        return s
-                    
-                    # Tentar parse direto primeiro
-                    try:
-                        tool_args = json.loads(tool_args_str)
-                    except json.JSONDecodeError:
-                        # Se falhar, tentar com sanitização mais agressiva
-                        # Usar ast.literal_eval como fallback para strings Python escapadas
-                        import ast
-                        try:
-                            # Tentar interpretar como string Python (que aceita mais escapes)
-                            # e depois converter para JSON
-                            sanitized = tool_args_str.encode('utf-8').decode('unicode_escape')
-                            tool_args = json.loads(sanitized)
-                        except Exception:
-                            # Última tentativa: substituir escapes problemáticos manualmente
-                            fixed = tool_args_str.replace('\\t', '\\\\t').replace('\\n', '\\\\n').replace('\\r', '\\\\r')
-                            tool_args = json.loads(fixed)
-                    
-                    logger.info(
-                        "Executando tool",
-                        name=tool_name,
-                        args=list(tool_args.keys())
-                    )
-                    await self._send_log_feedback(websocket, f"Executando: {tool_name}", progress_callback, "tool_start")
-                    
-                    tool_args["websocket"] = websocket
-                    
-                    tool_args["websocket"] = websocket
-                    
-                    # Passar cancel_state para tools que precisam verificar cancelamento
-                    tool_args["cancel_state"] = cancel_state
+            # Heartbeat único para o lote de tools (feedback constante)
+            heartbeat_task = asyncio.create_task(_heartbeat(websocket)) if websocket else None
 
-                    # INJETAR SESSION_ID para isolamento
-                    if conversation.id:
-                        tool_args["session_id"] = conversation.id
-                    
-                    # INJETAR MODELO DO MAGO para a tool call_external_model
-                    if tool_name == "call_external_model":
-                        tool_args["mago_model"] = mago_model
-
-                    # Heartbeat task para feedback constante
-                    async def heartbeat(ws):
-                        import asyncio
-                        import random
-                        messages = [
-                            "Ainda processando sua solicitação...",
-                            "O processo continua em execução, aguarde...",
-                            "Executando tarefa complexa...",
-                            "Trabalhando nisso..."
-                        ]
-                        try:
-                            while True:
-                                await asyncio.sleep(15) # A cada 15s
-                                if ws:
-                                    await ws.send_json({
-                                        "type": "status",
-                                        "status": "processing",
-                                        "content": random.choice(messages)
-                                    })
-                        except asyncio.CancelledError:
-                            pass
-
-                    # Iniciar heartbeat
-                    heartbeat_task = asyncio.create_task(heartbeat(websocket)) if websocket else None
-
-                    # Executar a tool
-                    try:
-                        result = await execute_tool(tool_name, tool_args)
-                    finally:
-                        # Cancelar heartbeat ao terminar
-                        if heartbeat_task:
-                            heartbeat_task.cancel()
-                            try:
-                                await heartbeat_task
-                            except asyncio.CancelledError:
-                                pass
-                    
-                    logger.info(
-                        "Tool executada",
-                        name=tool_name,
-                        success=result.get("success", False)
+            # Executar os tool calls concorrentemente (tempo do lote = tool mais lenta)
+            # quando todas são seguras; senão em sequência, na ordem do modelo
+            # Um lote com tool de efeito colateral não usa o memo e o invalida
+            # (ex: read_file depois de write_file precisa ler de novo)
+            batch_memo = tool_memo if all(is_cacheable(name) for name in soa["names"]) else None
+            
+            async def run_batch():
+                calls = (
+                    self._run_tool_call(
+                        tool_id, tool_name, tool_args_str,
+                        websocket, progress_callback, cancel_state,
+                        conversation.id, mago_model, batch_memo
                     )
+                    for tool_id, tool_name, tool_args_str in zip(soa["ids"], soa["names"], soa["args"])
+                )
+                if all(is_concurrency_safe(name) for name in soa["names"]):
+                    # Limite por lote para não disparar dezenas de buscas/chamadas de uma vez
+                    limit = asyncio.Semaphore(max(settings.max_parallel_tools, 1))
                     
-                    # Formatar resultado
-                    if result.get("success"):
-                        tool_result = result.get("output", "Executado com sucesso")
-                        await self._send_log_feedback(websocket, f"Tool {tool_name} executada com sucesso", progress_callback, "tool_end")
-                    else:
-                        tool_result = f"Erro: {result.get('error', 'Erro desconhecido')}"
-                        await self._send_log_feedback(websocket, f"Erro na tool {tool_name}", progress_callback, "error")
-                    
-                except json.JSONDecodeError as e:
-                    tool_result = f"Erro ao parsear argumentos: {str(e)}"
-                    logger.error("Erro ao parsear args da tool", error=str(e))
+                    async def limited(call):
+                        async with limit:
+                            return await call
                     
-                except Exception as e:
-                    tool_result = f"Erro ao executar: {str(e)}"
-                    logger.error("Erro ao executar tool", error=str(e))
+                    return await asyncio.gather(*map(limited, calls), return_exceptions=True)
                 
-                # Notificar resultado via WebSocket
-                if websocket:
-                    await websocket.send_json({
-                        "type": "tool_result",
-                        "tool": tool_name,
-                        "tool_id": tool_id,
-                        "result": tool_result[:500]  # Limitar tamanho
-                    })
+                # Shell, arquivos, containers... compartilham estado (ex: active_process)
+                outcomes = []
+                for call in calls:
+                    try:
+                        outcomes.append(await call)
+                    except Exception as e:
+                        outcomes.append(e)
+                return outcomes
+            
+            try:
+                # Um cancelamento interrompe as tools em andamento na hora
+                outcomes = await _unless_cancelled(run_batch(), cancel_state)
+            except _ProcessingCancelled:
+                return await self._cancelled_response(conversation.id, iteration)
+            finally:
+                if batch_memo is None:
+                    tool_memo.clear()
+                
+                # Cancelar heartbeat ao terminar
+                if heartbeat_task:
+                    heartbeat_task.cancel()
+                    try:
+                        await heartbeat_task
+                    except asyncio.CancelledError:
+                        pass
+            
+            # Resultados na ordem dos tool calls
+            all_failed = True
+            for tool_id, tool_name, outcome in zip(soa["ids"], soa["names"], outcomes):
+                if isinstance(outcome, BaseException):
+                    tool_result = f"Erro ao executar: {str(outcome)}"
+                    preview, result, arg_names = tool_result[:500], None, []
+                    logger.error("Erro ao executar tool", name=tool_name, error=str(outcome))
+                else:
+                    tool_result, preview, result, arg_names = outcome
                 
                 # Adicionar resultado às mensagens
                 messages.append({
                     "role": "tool",
                     "tool_call_id": tool_id,
-                    "content": tool_result
+                    "content": _cap_tool_result(tool_result)
                 })
                 
                 # Guardar procedimento para salvar no RAG depois
                 # Verificar se result foi definido (pode não ter sido se houve erro de parsing)
                 if result and result.get("success"):
+                    all_failed = False
                     executed_procedures.append({
                         "tool": tool_name,
-                        "args": tool_args,
-                        "result": tool_result[:500]
+                        "arg_names": arg_names,
+                        "result": preview
                     })
             
+            # Mesmo lote (tools e argumentos) falhando de novo: encerrar em vez
+            # de gastar iterações devolvendo o mesmo erro ao modelo
+            batch = tuple(zip(soa["names"], soa["args"]))
+            if all_failed and batch == failed_batch:
+                failed_repeats += 1
+            elif all_failed:
+                failed_batch, failed_repeats = batch, 1
+            else:
+                failed_batch, failed_repeats = None, 0
+            
+            if failed_repeats >= _MAX_REPEATED_FAILURES and not is_finished:
+                logger.warning(
+                    "Mesmo lote de tools falhou repetidamente - encerrando loop",
+                    tools=list(soa["names"]),
+                    repeats=failed_repeats,
+                    iteration=iteration
+                )
+                await self._send_log_feedback(websocket, "Erro: tools falhando repetidamente", progress_callback, "error")
+                await self.cleanup_resources(conversation.id)
+                return {
+                    "content": (
+                        f"Erro: a chamada de {', '.join(soa['names'])} falhou {failed_repeats} vezes seguidas "
+                        f"com os mesmos argumentos. Último erro: {preview}"
+                    ),
+                    "role": "assistant"
+                }
+            
+            # Manter limitado o histórico reenviado a cada iteração
+            compacted_upto = _compact_tool_results(messages, compacted_upto)
+            
             # Se finish_task foi executada, encerrar o loop imediatamente
             if is_finished:
                 logger.info(
@@ -656,7 +1161,7 @@ class AgentOrchestrator:
                     for tc in tool_calls:
                         if tc["function"]["name"] == "finish_task":
                             try:
-                                args = json.loads(tc["function"]["arguments"])
+                                args = _parse_tool_args(tc["function"]["arguments"])
                                 final_content = args.get("result", "Tarefa concluída.")
                                 break
                             except:
@@ -668,24 +1173,17 @@ class AgentOrchestrator:
                     "role": "assistant"
                 }
         
-        # Salvar procedimentos executados no RAG (após loop)
+        # Salvar procedimentos executados no RAG (após loop), sem fazer a
+        # resposta esperar pela vetorização e gravação
         if executed_procedures and rag:
-            try:
-                for proc in executed_procedures:
-                    # Criar descrição do procedimento
-                    description = f"Executou {proc['tool']} com argumentos: {list(proc['args'].keys())}"
-                    await rag.add_procedure(
-                        description=description,
-                        solution=proc['result'],
-                        tool_used=proc['tool']
-                    )
-            except Exception as e:
-                logger.warning("Erro ao salvar procedimentos no RAG", error=str(e))
+            task = asyncio.create_task(_persist_procedures(rag, executed_procedures))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
         
         # Se chegou aqui, excedeu iterações
         logger.warning(
             "Máximo de iterações excedido",
-            iterations=max_iterations
+            iterations=_MAX_AGENT_ITERS
         )
         
         await self.cleanup_resources(conversation.id)
@@ -699,6 +1197,21 @@ class AgentOrchestrator:
         if session_id:
             logger.info("Limpando recursos da sessão", session_id=session_id)
             try:
-                ContainerSessionManager.cleanup_container(session_id)
+                await ContainerSessionManager.cleanup_container(session_id)
             except Exception as e:
                 logger.error("Erro ao limpar container", error=str(e))
+
+
+# Instância singleton do orquestrador (sem estado por mensagem: conversa,
+# WebSocket e cancelamento chegam como argumentos de process_message)
+_orchestrator: Optional[AgentOrchestrator] = None
+
+
+def get_orchestrator() -> AgentOrchestrator:
+    """Retorna instância singleton do orquestrador"""
+    global _orchestrator
+    
+    if _orchestrator is None:
+        _orchestrator = AgentOrchestrator()
+    
+    return _orchestrator
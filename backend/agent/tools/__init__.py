@@ -63,14 +63,47 @@ TOOLS_BY_NAME: Dict[str, BaseTool] = {
 }
 
 
+# Definições no formato OpenAI (montadas no primeiro get_all_tools)
+_openai_tools: Optional[List[Dict[str, Any]]] = None
+
+
 def get_all_tools() -> List[Dict[str, Any]]:
     """
     Retorna definição de todas as tools no formato OpenAI.
     
+    As definições são montadas uma vez e a mesma lista é devolvida a cada
+    chamada (cada orquestrador e cada iteração do agente reusam o objeto);
+    quem chama não deve alterá-la.
+    
     Returns:
         Lista de dicionários com definição das tools
     """
-    return [tool.to_openai_tool() for tool in TOOLS]
+    global _openai_tools
+    
+    if _openai_tools is None:
+        _openai_tools = [tool.to_openai_tool() for tool in TOOLS]
+    
+    return _openai_tools
+
+
+def is_concurrency_safe(name: str) -> bool:
+    """
+    Indica se a tool pode rodar em paralelo com outras do mesmo lote.
+    
+    Tools desconhecidas são tratadas como não seguras.
+    """
+    tool = TOOLS_BY_NAME.get(name)
+    return bool(tool and tool.concurrency_safe)
+
+
+def is_cacheable(name: str) -> bool:
+    """
+    Indica se o resultado da tool pode ser reaproveitado para os mesmos argumentos.
+    
+    Tools desconhecidas são tratadas como não reaproveitáveis.
+    """
+    tool = TOOLS_BY_NAME.get(name)
+    return bool(tool and tool.cacheable)
 
 
 async def execute_tool(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
@@ -93,6 +126,15 @@ async def execute_tool(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
             "error": f"Tool não encontrada: {name}"
         }
     
+    # Argumentos malformados voltam ao modelo sem entrar na tool
+    error = tool.validate_args(args)
+    if error:
+        logger.warning("Argumentos inválidos para tool", name=name, error=error)
+        return {
+            "success": False,
+            "error": error
+        }
+    
     try:
         return await tool.execute(**args)
     except Exception as e:
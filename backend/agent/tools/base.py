@@ -6,7 +6,8 @@ Define interface para todas as ferramentas do agente
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from functools import cached_property
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel
 
 
@@ -39,6 +40,12 @@ class BaseTool(ABC):
     # Parâmetros aceitos
     parameters: List[ToolParameter] = []
     
+    # Pode rodar em paralelo com outras tools do mesmo lote (sem efeitos colaterais compartilhados)
+    concurrency_safe: bool = False
+    
+    # Resultado pode ser reaproveitado numa repetição da mesma chamada (só leitura)
+    cacheable: bool = False
+    
     def to_openai_tool(self) -> Dict[str, Any]:
         """
         Converte a tool para o formato OpenAI/OpenRouter.
@@ -85,6 +92,36 @@ class BaseTool(ABC):
             }
         }
     
+    @cached_property
+    def _argument_rules(self) -> Tuple[Tuple[str, ...], Dict[str, frozenset]]:
+        """Parâmetros obrigatórios e valores de enum (montados uma vez por tool)."""
+        required = tuple(p.name for p in self.parameters if p.required)
+        enums = {p.name: frozenset(p.enum) for p in self.parameters if p.enum}
+        return required, enums
+    
+    def validate_args(self, args: Dict[str, Any]) -> Optional[str]:
+        """
+        Confere os argumentos gerados pelo modelo contra os parâmetros declarados.
+        
+        Tipos não são checados (modelos mandam números como string e as
+        tools convertem); só obrigatórios ausentes e valores fora do enum.
+        
+        Returns:
+            Mensagem de erro ou None se os argumentos são válidos
+        """
+        required, enums = self._argument_rules
+        
+        missing = [name for name in required if args.get(name) is None]
+        if missing:
+            return f"Argumentos obrigatórios ausentes: {', '.join(missing)}"
+        
+        for name, allowed in enums.items():
+            value = args.get(name)
+            if value is not None and isinstance(value, str) and value not in allowed:
+                return f"Valor inválido para '{name}': {value} (use: {', '.join(sorted(allowed))})"
+        
+        return None
+    
     @abstractmethod
     async def execute(self, **kwargs) -> Dict[str, Any]:
         """
@@ -19,6 +19,7 @@ class DockerListTool(BaseTool):
     """Lista containers Docker em execução"""
     
     name = "docker_list"
+    concurrency_safe = True
     description = """Lista todos os containers Docker em execução no servidor.
 Mostra: nome, status, imagem, portas mapeadas."""
     
@@ -250,6 +251,7 @@ class DockerLogsTool(BaseTool):
     """Visualiza logs de um container Docker"""
     
     name = "docker_logs"
+    concurrency_safe = True
     description = """Visualiza os logs de um container Docker.
 Use para: monitorar execução, verificar erros, acompanhar progresso de processos.
 IMPORTANTE: Use esta ferramenta para verificar o estado dos serviços antes de tomar decisões."""
@@ -25,6 +25,7 @@ class ExternalModelTool(BaseTool):
     """
     
     name = "call_external_model"
+    concurrency_safe = True
     description = """Chama o modelo do Mago (modelo mais poderoso configurado) para tarefas complexas.
 Use APENAS quando a tarefa requer:
 - Raciocínio lógico muito complexo ou matemática avançada
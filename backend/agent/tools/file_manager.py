@@ -27,6 +27,8 @@ class ReadFileTool(BaseTool):
     """Lê o conteúdo de um arquivo"""
     
     name = "read_file"
+    concurrency_safe = True
+    cacheable = True
     description = """Lê o conteúdo de um arquivo do sistema.
 Por segurança, apenas arquivos nos diretórios de dados são acessíveis."""
     
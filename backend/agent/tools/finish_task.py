@@ -8,6 +8,7 @@ class FinishTaskTool(BaseTool):
     """
     
     name = "finish_task"
+    concurrency_safe = True
     description = "Finaliza a tarefa atual. Use APENAS quando todo o trabalho estiver concluído e verificado."
     
     parameters = [
@@ -10,6 +10,7 @@ from typing import Dict, Any, List, Optional
 import os
 import pathlib
 import asyncio
+import base64
 import uuid
 import re
 
@@ -94,7 +95,7 @@ O sistema detecta automaticamente se há GPU disponível para aceleração."""
         # 3. Executar no Container com Streaming
         logger.info(f"Iniciando transcrição ({model_size}) no container...")
         
-        container = ContainerSessionManager.get_or_create_container(session_id)
+        container = await ContainerSessionManager.get_or_create_container(session_id)
         if not container:
             return self._error("Falha ao obter container de sessão.")
             
@@ -105,9 +106,9 @@ O sistema detecta automaticamente se há GPU disponível para aceleração."""
         import threading
         
         # Preparar script
-        encoded_code = script_code.encode('utf-8').hex()
+        encoded_code = base64.b64encode(script_code.encode('utf-8')).decode('ascii')
         script_name = f"transcribe_{uuid.uuid4().hex[:8]}.py"
-        setup_cmd = f"/bin/bash -c 'if ! command -v xxd &> /dev/null; then apt-get update && apt-get install -y xxd; fi; echo {encoded_code} | xxd -r -p > /app/data/{script_name}'"
+        setup_cmd = f"/bin/bash -c 'echo {encoded_code} | base64 -d > /app/data/{script_name}'"
         
         exit_code, out = container.exec_run(setup_cmd)
         if exit_code != 0:
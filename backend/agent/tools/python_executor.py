@@ -6,6 +6,7 @@ Executa código Python em container Docker isolado
 """
 
 from typing import Dict, Any
+import base64
 import docker
 import tempfile
 import os
@@ -98,7 +99,7 @@ Bibliotecas disponíveis: numpy, pandas, requests, pillow, beautifulsoup4, matpl
         
         try:
             # Obter container da sessão (inicia se parado, cria se não existe)
-            container = ContainerSessionManager.get_or_create_container(session_id)
+            container = await ContainerSessionManager.get_or_create_container(session_id)
             if not container:
                 return self._error("Falha ao obter container de execução")
 
@@ -106,9 +107,9 @@ Bibliotecas disponíveis: numpy, pandas, requests, pillow, beautifulsoup4, matpl
             script_name = f"script_{uuid.uuid4().hex[:8]}.py"
             
             # Preparar o script no container
-            # Usando xxd como no ContainerSessionManager
-            encoded_code = code.encode('utf-8').hex()
-            setup_cmd = f"/bin/bash -c 'if ! command -v xxd &> /dev/null; then apt-get update && apt-get install -y xxd; fi; echo {encoded_code} | xxd -r -p > /app/data/{script_name}'"
+            # base64 (coreutils, sempre presente) ocupa ~1/3 a mais; hex ocupava o dobro
+            encoded_code = base64.b64encode(code.encode('utf-8')).decode('ascii')
+            setup_cmd = f"/bin/bash -c 'echo {encoded_code} | base64 -d > /app/data/{script_name}'"
             
             exit_code, out = container.exec_run(setup_cmd)
             if exit_code != 0:
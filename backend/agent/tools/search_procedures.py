@@ -17,6 +17,8 @@ class SearchProceduresTool(BaseTool):
     """Busca procedimentos anteriores no banco de conhecimento"""
     
     name = "search_procedures"
+    concurrency_safe = True
+    cacheable = True
     description = """Busca procedimentos e soluções anteriores no banco de conhecimento.
 Use para: encontrar soluções já aplicadas, recuperar comandos usados anteriormente,
 buscar referências de tarefas similares."""
@@ -33,6 +33,8 @@ class WebSearchTool(BaseTool):
     
     # Nome da ferramenta (usado nas chamadas)
     name = "web_search"
+    concurrency_safe = True
+    cacheable = True
     
     # Descrição para o modelo entender quando usar
     description = """Busca informações atuais e recentes na internet.
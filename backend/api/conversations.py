@@ -40,6 +40,16 @@ class Message(BaseModel):
     
     # Arquivos anexados à mensagem (lista de IDs de arquivos)
     attached_files: Optional[List[str]] = None
+    
+    def to_api_dict(self) -> dict:
+        """Mensagem no formato da API de chat (só os campos que o modelo recebe)."""
+        tool_call_id = self.tool_call_id
+        msg = {"role": "tool" if tool_call_id else self.role, "content": self.content}
+        if self.tool_calls:
+            msg["tool_calls"] = self.tool_calls
+        if tool_call_id:
+            msg["tool_call_id"] = tool_call_id
+        return msg
 
 
 class Conversation(BaseModel):
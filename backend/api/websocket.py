@@ -7,7 +7,9 @@ Gerencia conexões WebSocket para chat em tempo real
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from starlette.websockets import WebSocketState
-from typing import Optional
+from typing import Optional, Callable, Deque, Union
+from collections import deque
+import asyncio
 import json
 
 from config import get_settings, get_logger
@@ -20,7 +22,7 @@ from api.conversations import (
 )
 from api.uploads import load_file_content
 from api.ws_manager import get_ws_manager
-from agent.orchestrator import AgentOrchestrator
+from agent.orchestrator import get_orchestrator
 from services.rate_limiter import get_rate_limiter
 from services.task_queue import get_task_queue, TaskStatus
 
@@ -66,6 +68,64 @@ async def safe_send_json(websocket: WebSocket, data: dict) -> bool:
         return False
 
 
+async def _await_processing(
+    websocket: WebSocket,
+    process_task: asyncio.Task,
+    on_cancel: Callable[[], None],
+    pending_frames: Deque[Union[str, BaseException]]
+):
+    """
+    Aguarda o processamento da mensagem lendo o WebSocket em paralelo.
+    
+    Um "cancel" recebido no meio chama on_cancel na hora (o orquestrador
+    interrompe modelo/tools em andamento). Todos os frames lidos, inclusive o
+    cancel, vão para pending_frames, na ordem, e o loop principal os trata
+    depois; um erro de leitura (ex: desconexão) também é repassado por lá.
+    
+    Returns:
+        Resultado do processamento
+    """
+    receive_task = None
+    try:
+        while not process_task.done():
+            receive_task = asyncio.ensure_future(websocket.receive_text())
+            done, _ = await asyncio.wait(
+                {process_task, receive_task},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            if receive_task not in done:
+                receive_task.cancel()
+                try:
+                    await receive_task
+                except asyncio.CancelledError:
+                    pass
+                break
+            
+            try:
+                data = receive_task.result()
+            except Exception as e:
+                # Conexão caiu: terminar o processamento e deixar o loop tratar
+                pending_frames.append(e)
+                break
+            
+            pending_frames.append(data)
+            try:
+                is_cancel = json.loads(data).get("type") == "cancel"
+            except (json.JSONDecodeError, AttributeError):
+                is_cancel = False
+            if is_cancel:
+                on_cancel()
+        
+        return await process_task
+    except asyncio.CancelledError:
+        # Handler encerrado: não deixar o processamento órfão
+        process_task.cancel()
+        if receive_task:
+            receive_task.cancel()
+        raise
+
+
 # -------------------------------------------------
 # WebSocket Endpoint
 # -------------------------------------------------
@@ -143,8 +203,8 @@ async def websocket_chat(
             "conversation_id": conversation.id
         })
     
-    # Criar orquestrador do agente
-    orchestrator = AgentOrchestrator()
+    # Orquestrador do agente (compartilhado)
+    orchestrator = get_orchestrator()
     
     # Obter gerenciadores
     ws_manager = get_ws_manager()
@@ -157,9 +217,31 @@ async def websocket_chat(
     # Usado para sinalizar ao processamento que deve ser cancelado
     cancel_state = {
         "cancelled": False,
-        "active_process": None  # Armazena processo shell ativo (se houver)
+        "active_process": None,  # Armazena processo shell ativo (se houver)
+        "event": asyncio.Event()  # Acorda o orquestrador no meio de uma espera
     }
     
+    def request_cancel():
+        """Sinaliza o cancelamento e mata o processo shell ativo (se houver)."""
+        cancel_state["cancelled"] = True
+        cancel_state["event"].set()
+        
+        if cancel_state.get("active_process"):
+            try:
+                cancel_state["active_process"].kill()
+                logger.info("Processo shell ativo cancelado")
+            except Exception as e:
+                logger.warning("Erro ao matar processo", error=str(e))
+    
+    def reset_cancel():
+        """Limpa o estado de cancelamento para a próxima mensagem."""
+        cancel_state["cancelled"] = False
+        cancel_state["event"].clear()
+        cancel_state["active_process"] = None
+    
+    # Frames lidos enquanto uma mensagem era processada (ver _await_processing)
+    pending_frames: Deque[Union[str, BaseException]] = deque()
+    
     # Enviar tarefas ativas da conversa ao conectar
     try:
         active_tasks = await task_queue.list_tasks_by_conversation(conversation.id, limit=10)
@@ -176,8 +258,13 @@ async def websocket_chat(
     
     try:
         while True:
-            # Receber mensagem do cliente
-            data = await websocket.receive_text()
+            # Receber mensagem do cliente (primeiro as lidas durante o processamento)
+            if pending_frames:
+                data = pending_frames.popleft()
+                if isinstance(data, BaseException):
+                    raise data
+            else:
+                data = await websocket.receive_text()
             
             try:
                 message_data = json.loads(data)
@@ -200,16 +287,8 @@ async def websocket_chat(
                     conversation_id=conversation.id if conversation else None
                 )
                 
-                # Sinalizar cancelamento
-                cancel_state["cancelled"] = True
-                
-                # Se houver processo shell ativo, tentar matar
-                if cancel_state.get("active_process"):
-                    try:
-                        cancel_state["active_process"].kill()
-                        logger.info("Processo shell ativo cancelado")
-                    except Exception as e:
-                        logger.warning("Erro ao matar processo", error=str(e))
+                # Sinalizar cancelamento (e matar processo shell ativo)
+                request_cancel()
                 
                 # Notificar cliente
                 await websocket.send_json({
@@ -218,8 +297,7 @@ async def websocket_chat(
                 })
                 
                 # Reset do flag para próxima mensagem
-                cancel_state["cancelled"] = False
-                cancel_state["active_process"] = None
+                reset_cancel()
                 continue
             
             if msg_type == "message":
@@ -286,8 +364,7 @@ async def websocket_chat(
                     full_content = content + file_context
                 
                 # Reset do estado de cancelamento para nova mensagem
-                cancel_state["cancelled"] = False
-                cancel_state["active_process"] = None
+                reset_cancel()
                 
                 logger.info(
                     "Mensagem recebida",
@@ -389,12 +466,16 @@ async def websocket_chat(
                         )
                         print(f"[DEBUG] Processando mensagem: {content[:50]}...")
                         
-                        # Processar com o agente, passando modelos customizados e cancel_state
-                        response = await orchestrator.process_message(
+                        # Processar com o agente, passando modelos customizados e cancel_state;
+                        # o WebSocket continua sendo lido para o cancelamento chegar na hora
+                        process_task = asyncio.create_task(orchestrator.process_message(
                             conversation=conversation,
                             websocket=websocket,
                             custom_models=custom_models,
                             cancel_state=cancel_state
+                        ))
+                        response = await _await_processing(
+                            websocket, process_task, request_cancel, pending_frames
                         )
                         
                         print(f"[DEBUG] Resposta recebida: {str(response)[:100]}...")
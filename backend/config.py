@@ -48,6 +48,7 @@ class Settings(BaseSettings):
     # -------------------------------------------------
     openrouter_api_key: str = ""
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
+    openrouter_max_concurrency: int = 200  # requisições simultâneas (= conexões do pool)
     
     # -------------------------------------------------
     # Modelos de IA (via OpenRouter)
@@ -62,6 +63,30 @@ class Settings(BaseSettings):
     secondary_model: str = "openai/gpt-4.1-nano"
     secondary_model_timeout: int = 300  # segundos (5 minutos)
     
+    # Hedging: se o modelo da vez não responder em N segundos, o próximo da
+    # escada (2ª Instância, depois Mago) é disparado em paralelo e vale a
+    # primeira resposta válida. 0 desativa (fallback só após falha)
+    model_hedge_delay: float = 30.0
+    
+    # Tools seguras de um mesmo lote rodando ao mesmo tempo (resto espera a vez)
+    max_parallel_tools: int = 8
+    
+    # -------------------------------------------------
+    # LLM Local (Ollama, API compatível com OpenAI)
+    # -------------------------------------------------
+    local_llm_base_url: str = "http://localhost:11434/v1"
+    local_llm_api_key: str = "ollama"
+    
+    # Modelo primário local: Gemma 3 4B (3 minutos timeout)
+    primary_llm_model: str = "gemma3:4b"
+    primary_llm_timeout: int = 180  # segundos
+    primary_llm_concurrency: int = 1  # chamadas simultâneas ao modelo
+    
+    # Modelo secundário local: Llama 3.2 (5 minutos timeout)
+    secondary_llm_model: str = "llama3.2"
+    secondary_llm_timeout: int = 300  # segundos
+    secondary_llm_concurrency: int = 1
+    
     # -------------------------------------------------
     # Autenticação (valores devem vir do .env)
     # -------------------------------------------------
@@ -83,6 +108,7 @@ class Settings(BaseSettings):
     # -------------------------------------------------
     max_execution_time: int = 300  # segundos
     max_memory_mb: int = 512       # MB
+    sandbox_prewarm_pool_size: int = 2  # containers ociosos prontos para novas sessões
     
     # -------------------------------------------------
     # Caminhos
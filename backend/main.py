@@ -9,6 +9,7 @@ from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 
 from config import get_settings, get_logger
@@ -23,6 +24,9 @@ from api.tasks import router as tasks_router
 
 # Importar background worker
 from services.background_worker import start_background_worker, stop_background_worker
+from agent.container_session_manager import ContainerSessionManager
+from agent.local_llm_client import aclose_local_llm_clients
+from agent.openrouter_client import aclose_openrouter_client
 
 # -------------------------------------------------
 # Inicialização
@@ -79,6 +83,14 @@ async def startup_event():
     # Iniciar background worker para processamento de tarefas
     await start_background_worker()
     logger.info("Background worker iniciado")
+    
+    # Garantir imagem do sandbox antes da primeira sessão
+    try:
+        await asyncio.to_thread(ContainerSessionManager.ensure_image)
+        logger.info("Imagem do sandbox verificada")
+        await ContainerSessionManager.start_prewarm()
+    except Exception as e:
+        logger.error("Erro ao preparar imagem do sandbox", error=str(e))
 
 
 @app.on_event("shutdown")
@@ -91,6 +103,15 @@ async def shutdown_event():
     await stop_background_worker()
     logger.info("Background worker parado")
     
+    # Fechar conexão compartilhada com o Docker
+    await ContainerSessionManager.aclose()
+    
+    # Fechar pool HTTP do LLM local
+    await aclose_local_llm_clients()
+    
+    # Fechar sessão HTTP do OpenRouter
+    await aclose_openrouter_client()
+    
     logger.info("Zeus encerrando")
 
 
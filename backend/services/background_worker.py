@@ -18,7 +18,7 @@ from services.task_queue import (
 )
 from api.ws_manager import get_ws_manager, WebSocketManager
 from api.conversations import load_conversation, save_conversation, Message
-from agent.orchestrator import AgentOrchestrator
+from agent.orchestrator import get_orchestrator
 
 # -------------------------------------------------
 # Configuração
@@ -233,8 +233,8 @@ class BackgroundWorker:
             )
             conversation.messages.append(user_message)
             
-            # Cria orquestrador
-            orchestrator = AgentOrchestrator()
+            # Orquestrador (compartilhado)
+            orchestrator = get_orchestrator()
             
             # Cria callback de progresso
             async def progress_callback(message: str, step_type: str = "info"):
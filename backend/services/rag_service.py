@@ -8,8 +8,11 @@ Memória de longo prazo usando ChromaDB
 from typing import List, Dict, Any, Optional
 import chromadb
 from chromadb.config import Settings
+from collections import OrderedDict
+import asyncio
 import hashlib
 import json
+import time
 
 from config import get_settings, get_logger
 
@@ -56,6 +59,11 @@ class RAGService:
     PROCEDURES_COLLECTION = "procedures"
     CONVERSATIONS_COLLECTION = "conversations"
     
+    # Cache de get_context_for_query (consulta normalizada -> contexto).
+    # Qualquer gravação ou remoção nas coleções esvazia o cache.
+    CONTEXT_CACHE_TTL = 300.0
+    CONTEXT_CACHE_SIZE = 4096
+    
     def __init__(self):
         """Inicializa o serviço RAG"""
         self.client = get_chroma_client()
@@ -71,6 +79,12 @@ class RAGService:
             metadata={"description": "Histórico de conversas importantes"}
         )
         
+        # Chave -> (instante monotônico, contexto), em ordem de uso (LRU)
+        self._context_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Incrementada a cada mudança na base; um contexto montado durante
+        # uma mudança não entra no cache
+        self._context_generation = 0
+        
         logger.info(
             "RAG Service inicializado",
             procedures_count=self.procedures.count(),
@@ -81,6 +95,27 @@ class RAGService:
         """Gera ID único baseado no conteúdo"""
         return hashlib.md5(content.encode()).hexdigest()
     
+    def _procedure_document(
+        self,
+        description: str,
+        solution: str,
+        tool_used: str,
+        tags: List[str] = None,
+        metadata: Dict[str, Any] = None
+    ) -> tuple:
+        """Monta (id, texto, metadados) de um procedimento para o ChromaDB."""
+        # Texto combinado para embedding
+        full_text = f"{description}\n\nSolução: {solution}\n\nFerramenta: {tool_used}"
+        
+        # Preparar metadados
+        meta = {
+            "tool_used": tool_used,
+            "tags": json.dumps(tags or []),
+            **(metadata or {})
+        }
+        
+        return self._generate_id(full_text), full_text, meta
+    
     async def add_procedure(
         self,
         description: str,
@@ -102,18 +137,9 @@ class RAGService:
         Returns:
             ID do procedimento adicionado
         """
-        # Texto combinado para embedding
-        full_text = f"{description}\n\nSolução: {solution}\n\nFerramenta: {tool_used}"
-        
-        # Gerar ID único
-        doc_id = self._generate_id(full_text)
-        
-        # Preparar metadados
-        meta = {
-            "tool_used": tool_used,
-            "tags": json.dumps(tags or []),
-            **(metadata or {})
-        }
+        doc_id, full_text, meta = self._procedure_document(
+            description, solution, tool_used, tags, metadata
+        )
         
         try:
             # Adicionar ao ChromaDB
@@ -123,6 +149,7 @@ class RAGService:
                 ids=[doc_id]
             )
             
+            self._invalidate_context_cache()
             logger.info("Procedimento adicionado", id=doc_id, tool=tool_used)
             return doc_id
             
@@ -133,6 +160,51 @@ class RAGService:
                 return doc_id
             raise
     
+    async def add_procedures_bulk(self, procedures: List[Dict[str, Any]]) -> List[str]:
+        """
+        Adiciona vários procedimentos numa única chamada ao ChromaDB.
+        
+        Os embeddings do lote são gerados de uma vez e gravados numa só
+        operação, em vez de uma ida ao banco por procedimento.
+        
+        Args:
+            procedures: Dicts com os argumentos de add_procedure
+                (description, solution, tool_used e, opcionais, tags e metadata)
+            
+        Returns:
+            IDs dos procedimentos adicionados
+        """
+        # IDs repetidos no mesmo lote fazem o ChromaDB rejeitar a chamada inteira
+        docs = {}
+        for proc in procedures:
+            doc_id, full_text, meta = self._procedure_document(**proc)
+            docs[doc_id] = (full_text, meta)
+        
+        if not docs:
+            return []
+        
+        # IDs são hash do texto: os que já estão na coleção não precisam de
+        # embedding de novo (o ChromaDB só os ignoraria depois de calcular)
+        existing = await asyncio.to_thread(self.procedures.get, ids=list(docs), include=[])
+        for doc_id in existing["ids"]:
+            docs.pop(doc_id, None)
+        
+        if not docs:
+            return []
+        
+        ids = list(docs)
+        # Embedding + gravação em thread, sem travar o event loop
+        await asyncio.to_thread(
+            self.procedures.add,
+            documents=[text for text, _ in docs.values()],
+            metadatas=[meta for _, meta in docs.values()],
+            ids=ids
+        )
+        
+        self._invalidate_context_cache()
+        logger.info("Procedimentos adicionados", count=len(ids))
+        return ids
+    
     async def search_procedures(
         self,
         query: str,
@@ -157,7 +229,8 @@ class RAGService:
                 where = {"tool_used": tool_filter}
             
             # Buscar
-            results = self.procedures.query(
+            results = await asyncio.to_thread(
+                self.procedures.query,
                 query_texts=[query],
                 n_results=n_results,
                 where=where
@@ -220,6 +293,7 @@ class RAGService:
                 ids=[conversation_id]
             )
             
+            self._invalidate_context_cache()
             logger.info("Resumo de conversa adicionado", id=conversation_id)
             return conversation_id
             
@@ -231,6 +305,7 @@ class RAGService:
                     metadatas=[meta],
                     ids=[conversation_id]
                 )
+                self._invalidate_context_cache()
                 return conversation_id
             raise
     
@@ -250,7 +325,8 @@ class RAGService:
             Lista de resumos de conversas
         """
         try:
-            results = self.conversations.query(
+            results = await asyncio.to_thread(
+                self.conversations.query,
                 query_texts=[query],
                 n_results=n_results
             )
@@ -283,6 +359,8 @@ class RAGService:
         Obtém contexto completo para uma query.
         
         Combina procedimentos e conversas relevantes em um texto formatado.
+        Consultas repetidas (mesmo texto, ignorando caixa e espaços) são
+        respondidas do cache enquanto a base não mudar.
         
         Args:
             query: Texto de busca
@@ -292,6 +370,37 @@ class RAGService:
         Returns:
             Texto formatado com contexto
         """
+        key = (" ".join(query.lower().split()), max_procedures, max_conversations)
+        cached = self._context_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.CONTEXT_CACHE_TTL:
+            self._context_cache.move_to_end(key)
+            return cached[1]
+        
+        generation = self._context_generation
+        context = await self._build_context(query, max_procedures, max_conversations)
+        if generation != self._context_generation:
+            # A base mudou enquanto o contexto era montado
+            return context
+        
+        self._context_cache[key] = (time.monotonic(), context)
+        self._context_cache.move_to_end(key)
+        if len(self._context_cache) > self.CONTEXT_CACHE_SIZE:
+            self._context_cache.popitem(last=False)
+        
+        return context
+    
+    def _invalidate_context_cache(self):
+        """Descarta os contextos guardados após qualquer mudança na base."""
+        self._context_generation += 1
+        self._context_cache.clear()
+    
+    async def _build_context(
+        self,
+        query: str,
+        max_procedures: int,
+        max_conversations: int
+    ) -> str:
+        """Monta o texto de contexto (sem cache); ver get_context_for_query."""
         context_parts = []
         
         # Buscar procedimentos
@@ -369,6 +478,7 @@ class RAGService:
         """
         try:
             self.procedures.delete(ids=[doc_id])
+            self._invalidate_context_cache()
             logger.info("Procedimento removido", id=doc_id)
             return True
         except Exception as e:
@@ -426,6 +536,7 @@ class RAGService:
         """
         try:
             self.conversations.delete(ids=[conversation_id])
+            self._invalidate_context_cache()
             logger.info("Conversa removida", id=conversation_id)
             return True
         except Exception as e:
@@ -238,141 +238,158 @@ function handleWebSocketMessage(event) {
     try {
         const data = JSON.parse(event.data);
         console.log('[Chat] Mensagem recebida:', data.type);
+        handleServerEvent(data);
+    } catch (error) {
+        console.error('[Chat] Erro ao processar mensagem:', error);
+    }
+}
 
-        switch (data.type) {
-            case 'conversation_created':
-                // Nova conversa criada pelo servidor
-                Conversations.loadConversations();
-                break;
 
-            case 'message':
-                // Mensagem completa do assistente
-                hideTypingIndicator();
-                hideToolModal(); // Garantir que modal está fechado
-                hideCancelButton(); // Esconder botão de cancelar
-                addMessage('assistant', data.content, data.tool_calls);
-                setConversationProcessing(getCurrentConversationId(), false);
-                enableInput();
-                break;
-
-            case 'cancelled':
-                // Processamento foi cancelado pelo usuário
+/**
+ * Trata um evento do servidor (já decodificado)
+ * @param {Object} data - Evento com campo type
+ */
+function handleServerEvent(data) {
+    switch (data.type) {
+        case 'batch':
+            // Vários eventos agrupados num único frame pelo backend
+            data.events.forEach(handleServerEvent);
+            break;
+
+        case 'conversation_created':
+            // Nova conversa criada pelo servidor
+            Conversations.loadConversations();
+            break;
+
+        case 'message':
+            // Mensagem completa do assistente
+            hideTypingIndicator();
+            hideToolModal(); // Garantir que modal está fechado
+            hideCancelButton(); // Esconder botão de cancelar
+            addMessage('assistant', data.content, data.tool_calls);
+            setConversationProcessing(getCurrentConversationId(), false);
+            enableInput();
+            break;
+
+        case 'cancelled':
+            // Processamento foi cancelado pelo usuário
+            hideTypingIndicator();
+            hideToolModal();
+            hideCancelButton();
+            addMessage('system', `⛔ ${data.content || 'Processamento cancelado pelo usuário.'}`);
+            setConversationProcessing(getCurrentConversationId(), false);
+            enableInput();
+            break;
+
+        case 'chunk':
+            // Chunk de streaming (não implementado nesta versão)
+            break;
+
+        case 'status':
+            if (data.status === 'processing') {
+                showTypingIndicator(data.content);
+            } else if (data.status === 'idle') {
                 hideTypingIndicator();
-                hideToolModal();
-                hideCancelButton();
-                addMessage('system', `⛔ ${data.content || 'Processamento cancelado pelo usuário.'}`);
-                setConversationProcessing(getCurrentConversationId(), false);
-                enableInput();
-                break;
-
-            case 'chunk':
-                // Chunk de streaming (não implementado nesta versão)
-                break;
-
-            case 'status':
-                if (data.status === 'processing') {
-                    showTypingIndicator(data.content);
-                } else if (data.status === 'idle') {
-                    hideTypingIndicator();
-                }
-                break;
+            }
+            break;
 
-            case 'tool_start':
-                showToolModal(data.tool);
-                break;
+        case 'tool_start':
+            showToolModal(data.tool);
+            break;
 
-            case 'tool_log':
-                updateToolLog(data.output);
-                break;
+        case 'tool_log':
+            updateToolLog(data.output);
+            break;
 
-            case 'tool_result':
-                hideToolModal();
-                break;
+        case 'tool_result':
+            hideToolModal();
+            break;
 
-            case 'backend_log':
-                // Exibe descrição do log do backend no indicador de digitação
-                console.log('[Chat] Backend log:', data.message);
-                showTypingIndicator(data.message);
-                break;
+        case 'tool_done':
+            // Tool rápida: início e resultado num único frame. Nenhum
+            // modal foi aberto para ela, então não há o que fechar
+            break;
 
-            case 'error':
-                hideTypingIndicator();
-                hideToolModal();
-                hideCancelButton();
-                addMessage('system', `❌ ${data.content}`);
-                setConversationProcessing(getCurrentConversationId(), false);
-                enableInput();
-                break;
-
-            case 'task_created':
-                // Tarefa foi criada para processamento em background
-                console.log('[Chat] Tarefa criada:', data.task_id);
-                showTypingIndicator('Processamento em background iniciado...');
-                addMessage('system', `📋 ${data.message || 'Sua mensagem foi enfileirada para processamento em background.'}`);
-                // Não esconder botão de cancelar - tarefa ainda está processando
-                break;
-
-            case 'task_status':
-                // Atualização de status de tarefa
-                console.log('[Chat] Status da tarefa:', data.task_id, data.status, data.conversation_id);
-
-                // Sempre atualizar estado de processamento desta conversa específica
-                // Se completou ou falhou, não está mais processando
-                if (data.status === 'completed' || data.status === 'failed') {
-                    if (data.conversation_id) {
-                        setConversationProcessing(data.conversation_id, false);
-                    }
+        case 'backend_log':
+            // Exibe descrição do log do backend no indicador de digitação
+            console.log('[Chat] Backend log:', data.message);
+            showTypingIndicator(data.message);
+            break;
+
+        case 'error':
+            hideTypingIndicator();
+            hideToolModal();
+            hideCancelButton();
+            addMessage('system', `❌ ${data.content}`);
+            setConversationProcessing(getCurrentConversationId(), false);
+            enableInput();
+            break;
+
+        case 'task_created':
+            // Tarefa foi criada para processamento em background
+            console.log('[Chat] Tarefa criada:', data.task_id);
+            showTypingIndicator('Processamento em background iniciado...');
+            addMessage('system', `📋 ${data.message || 'Sua mensagem foi enfileirada para processamento em background.'}`);
+            // Não esconder botão de cancelar - tarefa ainda está processando
+            break;
+
+        case 'task_status':
+            // Atualização de status de tarefa
+            console.log('[Chat] Status da tarefa:', data.task_id, data.status, data.conversation_id);
+
+            // Sempre atualizar estado de processamento desta conversa específica
+            // Se completou ou falhou, não está mais processando
+            if (data.status === 'completed' || data.status === 'failed') {
+                if (data.conversation_id) {
+                    setConversationProcessing(data.conversation_id, false);
                 }
+            }
 
-                // Só atualizar UI se for a conversa atual
-                const isCurrentConv = !data.conversation_id || data.conversation_id === getCurrentConversationId();
+            // Só atualizar UI se for a conversa atual
+            const isCurrentConv = !data.conversation_id || data.conversation_id === getCurrentConversationId();
 
-                if (isCurrentConv) {
-                    if (data.status === 'completed') {
-                        hideTypingIndicator();
-                        hideCancelButton();
-                        if (data.result) {
-                            // Passar tempo de execução se disponível
-                            addMessage('assistant', data.result, data.tool_calls, data.execution_time);
-                        }
-                        enableInput();
-                        // Recarregar conversa para pegar mensagens salvas
-                        Conversations.loadConversations();
-                    } else if (data.status === 'failed') {
-                        hideTypingIndicator();
-                        hideCancelButton();
-                        addMessage('system', `❌ Erro no processamento: ${data.error || 'Erro desconhecido'}`);
-                        enableInput();
-                    } else if (data.status === 'processing') {
-                        showTypingIndicator(`Processando tarefa...`);
-                    } else if (data.status === 'pending') {
-                        showTypingIndicator(`Tarefa na fila de processamento...`);
+            if (isCurrentConv) {
+                if (data.status === 'completed') {
+                    hideTypingIndicator();
+                    hideCancelButton();
+                    if (data.result) {
+                        // Passar tempo de execução se disponível
+                        addMessage('assistant', data.result, data.tool_calls, data.execution_time);
                     }
+                    enableInput();
+                    // Recarregar conversa para pegar mensagens salvas
+                    Conversations.loadConversations();
+                } else if (data.status === 'failed') {
+                    hideTypingIndicator();
+                    hideCancelButton();
+                    addMessage('system', `❌ Erro no processamento: ${data.error || 'Erro desconhecido'}`);
+                    enableInput();
+                } else if (data.status === 'processing') {
+                    showTypingIndicator(`Processando tarefa...`);
+                } else if (data.status === 'pending') {
+                    showTypingIndicator(`Tarefa na fila de processamento...`);
                 }
-                break;
-
-            case 'task_progress':
-                // Progresso de uma tarefa em execução
-                console.log('[Chat] Progresso da tarefa:', data.message, data.conversation_id);
+            }
+            break;
 
-                // Sempre marcar como processando se receber progresso
-                if (data.conversation_id) {
-                    setConversationProcessing(data.conversation_id, true);
-                }
+        case 'task_progress':
+            // Progresso de uma tarefa em execução
+            console.log('[Chat] Progresso da tarefa:', data.message, data.conversation_id);
 
-                // Só atualizar UI se for a conversa atual
-                if (!data.conversation_id || data.conversation_id === getCurrentConversationId()) {
-                    showTypingIndicator(data.message);
-                }
-                break;
+            // Sempre marcar como processando se receber progresso
+            if (data.conversation_id) {
+                setConversationProcessing(data.conversation_id, true);
+            }
 
-            case 'pong':
-                // Keep-alive response
-                break;
-        }
+            // Só atualizar UI se for a conversa atual
+            if (!data.conversation_id || data.conversation_id === getCurrentConversationId()) {
+                showTypingIndicator(data.message);
+            }
+            break;
 
-    } catch (error) {
-        console.error('[Chat] Erro ao processar mensagem:', error);
+        case 'pong':
+            // Keep-alive response
+            break;
     }
 }
 